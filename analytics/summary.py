@@ -0,0 +1,15 @@
+from db.rollups import get_status_totals, get_users_with_applications_count
+
+
+async def build_summary() -> dict:
+    # Считается по дневным роллапам (db/rollups.py), без прохода по applications
+    statuses = await get_status_totals()
+    confirmed = statuses.get("confirmed", {})
+    pending = statuses.get("pending", {})
+
+    return {
+        "total_confirmed": confirmed.get("gross_bonus", 0),
+        "pending_count": pending.get("applications", 0),
+        "confirmed_count": confirmed.get("applications", 0),
+        "users_count": await get_users_with_applications_count(),
+    }
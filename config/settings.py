@@ -15,4 +15,93 @@ if _admin_ids_raw:
     except ValueError as e:
         raise ValueError(f"Ошибка в ADMIN_IDS: {e}. Убедитесь, что там только числа, разделённые запятыми.")
 else:
-    ADMIN_IDS = set()
\ No newline at end of file
+    ADMIN_IDS = set()
+
+# Пул соединений SQLite
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+
+# WAL: один писатель + пул read-only читателей
+DB_WAL_MODE = os.getenv("DB_WAL_MODE", "false").strip().lower() in ("1", "true", "yes")
+DB_WAL_CHECKPOINT_INTERVAL = int(os.getenv("DB_WAL_CHECKPOINT_INTERVAL", "300"))
+DB_WAL_TRUNCATE_PAGES = int(os.getenv("DB_WAL_TRUNCATE_PAGES", "10000"))
+
+# Write-behind: пакетная запись регистраций и правок профиля
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "50"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+
+# Общая aiohttp-сессия для внешних HTTP-запросов (сокращатель ссылок)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5"))
+
+# Кэш сокращённых ссылок (db/short_links.py)
+SHORT_LINK_TTL = int(os.getenv("SHORT_LINK_TTL", str(30 * 24 * 3600)))
+SHORT_LINK_LRU_SIZE = int(os.getenv("SHORT_LINK_LRU_SIZE", "4096"))
+
+# Фоновое сокращение ссылок (jobs/preshorten_links.py)
+PRESHORTEN_RATE = float(os.getenv("PRESHORTEN_RATE", "5"))
+PRESHORTEN_RETRIES = int(os.getenv("PRESHORTEN_RETRIES", "3"))
+
+# Предохранитель сокращателя ссылок (services/circuit_breaker.py)
+SHORTENER_TIMEOUT = float(os.getenv("SHORTENER_TIMEOUT", "2"))
+SHORTENER_FAILURE_THRESHOLD = int(os.getenv("SHORTENER_FAILURE_THRESHOLD", "5"))
+SHORTENER_RESET_TIMEOUT = float(os.getenv("SHORTENER_RESET_TIMEOUT", "30"))
+SHORTENER_HEDGE = os.getenv("SHORTENER_HEDGE", "true").strip().lower() in ("1", "true", "yes")
+
+# Backend сокращателя ссылок (services/shortener.py): clck | local | none
+SHORTENER_BACKEND = os.getenv("SHORTENER_BACKEND", "clck").strip().lower()
+# Для backend "local": публичный адрес сервера редиректов и где его слушать
+SHORTENER_BASE_URL = os.getenv("SHORTENER_BASE_URL", "http://localhost:8080")
+REDIRECT_HOST = os.getenv("REDIRECT_HOST", "0.0.0.0")
+REDIRECT_PORT = int(os.getenv("REDIRECT_PORT", "8080"))
+
+# Ключ подписи deep-link payload (services/deeplink.py); по умолчанию выводится из BOT_TOKEN
+DEEPLINK_SECRET = os.getenv("DEEPLINK_SECRET", "")
+
+# FSM-хранилище в SQLite (db/fsm_storage.py)
+FSM_FLUSH_INTERVAL_MS = int(os.getenv("FSM_FLUSH_INTERVAL_MS", "100"))
+FSM_HOT_TTL = float(os.getenv("FSM_HOT_TTL", "900"))
+FSM_HOT_MAX = int(os.getenv("FSM_HOT_MAX", "10000"))
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(7 * 24 * 3600)))
+FSM_EVICT_INTERVAL = int(os.getenv("FSM_EVICT_INTERVAL", "300"))
+
+# Получение апдейтов: polling (разработка) или webhook (services/webhook_server.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Публичный адрес, на который Telegram шлёт апдейты, например https://bot.example.com
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Заголовок X-Telegram-Bot-Api-Secret-Token; по умолчанию выводится из BOT_TOKEN
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8081"))
+# Сколько ждать начатые апдейты при остановке
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+# Bearer-токен для /analytics/* на webhook-сервере; пустой — эндпоинты не подключаются
+ANALYTICS_TOKEN = os.getenv("ANALYTICS_TOKEN", "")
+# Сбрасывать ли накопившиеся апдейты при старте (раньше сбрасывались всегда)
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "false").strip().lower() in ("1", "true", "yes")
+
+# Планировщик апдейтов (middlewares/scheduler.py)
+UPDATE_MAX_IN_FLIGHT = int(os.getenv("UPDATE_MAX_IN_FLIGHT", "32"))
+# Сколько апдейтов может ждать всего и от одного пользователя, прежде чем новые отбрасываются
+UPDATE_MAX_PENDING = int(os.getenv("UPDATE_MAX_PENDING", "1000"))
+UPDATE_USER_QUEUE_MAX = int(os.getenv("UPDATE_USER_QUEUE_MAX", "5"))
+
+# Входящий троттлинг (middlewares/throttling.py): токенов в секунду и запас
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", "2"))
+THROTTLE_USER_BURST = float(os.getenv("THROTTLE_USER_BURST", "8"))
+THROTTLE_CHAT_RATE = float(os.getenv("THROTTLE_CHAT_RATE", "5"))
+THROTTLE_CHAT_BURST = float(os.getenv("THROTTLE_CHAT_BURST", "20"))
+# На пользователя в пределах одного семейства хендлеров (модуля handlers/*)
+THROTTLE_FAMILY_RATE = float(os.getenv("THROTTLE_FAMILY_RATE", "1"))
+THROTTLE_FAMILY_BURST = float(os.getenv("THROTTLE_FAMILY_BURST", "4"))
+
+# Исходящие отправки (services/send_scheduler.py): лимиты Telegram
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+# Короткий всплеск в один чат (ответ + правка клавиатуры) без задержки
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
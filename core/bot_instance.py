@@ -1,5 +1,20 @@
 from aiogram import Dispatcher
 from handlers import register_all_handlers
+from middlewares import FSMBufferMiddleware, ThrottlingMiddleware, UpdateScheduler
+from services.send_scheduler import SendScheduler
 
 async def setup_bot(dp: Dispatcher, bot):
-    register_all_handlers(dp)
\ No newline at end of file
+    # Очереди по user_id и общий лимит — до чтения FSM-состояния
+    scheduler = UpdateScheduler()
+    scheduler.install(dp)
+    dp["update_scheduler"] = scheduler
+    # После FSMContextMiddleware диспетчера — подменяет его контекст
+    dp.update.outer_middleware(FSMBufferMiddleware())
+    throttling = ThrottlingMiddleware()
+    throttling.install(dp)
+    dp["throttling"] = throttling
+    # Лимиты Telegram на исходящие сообщения и повтор при 429
+    send_scheduler = SendScheduler()
+    bot.session.middleware(send_scheduler)
+    dp["send_scheduler"] = send_scheduler
+    register_all_handlers(dp)
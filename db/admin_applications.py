@@ -20,7 +20,7 @@
 from .base import get_db_connection
 
 async def get_user_applications_page(user_id: int, limit: int = 5, offset: int = 0) -> list[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute("""
             SELECT
                 bank_key,
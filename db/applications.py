@@ -1,5 +1,6 @@
 from typing import Optional, List
 from .base import get_db_connection
+from .sketches import sketch_statement
 
 # =========================
 # APPLICATIONS (future-ready)
@@ -26,11 +27,12 @@ async def create_application(
             VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
         """
         await db.execute(query, (user_id, bank_key, product_key, variant_key, traffic_source))
+        await db.execute(*sketch_statement(user_id, bank_key, traffic_source))
         await db.commit()
 
 
 async def get_application_by_id(application_id: int) -> Optional[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute(
             "SELECT * FROM applications WHERE id = ?",
             (application_id,)
@@ -40,7 +42,7 @@ async def get_application_by_id(application_id: int) -> Optional[dict]:
 
 
 async def get_applications_by_user(user_id: int) -> List[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute(
             "SELECT * FROM applications WHERE user_id = ? ORDER BY created_at DESC",
             (user_id,)
@@ -50,7 +52,7 @@ async def get_applications_by_user(user_id: int) -> List[dict]:
 
 
 async def get_applications_by_bank(bank_key: str) -> List[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute(
             "SELECT * FROM applications WHERE bank_key = ? ORDER BY created_at DESC",
             (bank_key,)
@@ -60,7 +62,7 @@ async def get_applications_by_bank(bank_key: str) -> List[dict]:
 
 
 async def get_recent_applications(days: int = 7) -> List[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute(
             """
             SELECT *
@@ -75,7 +77,7 @@ async def get_recent_applications(days: int = 7) -> List[dict]:
 
 
 async def get_all_applications() -> List[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute(
             "SELECT * FROM applications ORDER BY created_at DESC"
         )
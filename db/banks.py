@@ -1,8 +1,9 @@
 from db.base import get_db_connection
+from db.catalog import refresh_catalog
 
 
 async def get_active_banks():
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute(
             """
             SELECT bank_key, bank_title, bank_name
@@ -15,7 +16,7 @@ async def get_active_banks():
 
 
 async def get_bank_by_name(bank_name: str):
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute(
             """
             SELECT bank_key, bank_title, bank_name
@@ -41,6 +42,7 @@ async def create_bank(bank_key: str, bank_name: str, bank_title: str, is_active:
         """
         await db.execute(query, (bank_key, bank_name, bank_title, is_active))
         await db.commit()
+    await refresh_catalog()
 
 
 async def toggle_bank(bank_key: str, is_active: int):
@@ -52,3 +54,4 @@ async def toggle_bank(bank_key: str, is_active: int):
         """
         await db.execute(query, (is_active, bank_key))
         await db.commit()
+    await refresh_catalog()
@@ -1,8 +1,14 @@
 import aiosqlite
+import asyncio
+import logging
 import os
+import time
+from collections import deque
 from contextlib import asynccontextmanager
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = settings.DATABASE_URL
 if DATABASE_URL.startswith("sqlite:///"):
     DB_PATH = DATABASE_URL.replace("sqlite:///", "")
@@ -11,22 +17,288 @@ elif DATABASE_URL.startswith("sqlite:"):
 else:
     DB_PATH = DATABASE_URL
 
+
+# =========================
+# CONNECTION POOL
+# =========================
+class ConnectionPool:
+    """
+    Ограниченный пул долгоживущих aiosqlite-соединений.
+    PRAGMA применяются один раз при открытии соединения,
+    простаивающие соединения проверяются перед выдачей.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        health_check_interval: float,
+        readonly: bool = False,
+        pragmas: tuple[str, ...] = (),
+    ):
+        self.path = path
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self.readonly = readonly
+        self.pragmas = pragmas
+
+        self._idle: deque[tuple[aiosqlite.Connection, float]] = deque()
+        self._opened = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+
+        # счётчики
+        self._leases = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._reconnects = 0
+
+    async def _connect(self) -> aiosqlite.Connection:
+        if self.readonly:
+            db = await aiosqlite.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+        else:
+            db = await aiosqlite.connect(self.path)
+        db.row_factory = aiosqlite.Row
+        await db.execute("PRAGMA busy_timeout=5000;")
+        await db.execute("PRAGMA foreign_keys=ON;")
+        for pragma in self.pragmas:
+            await db.execute(pragma)
+        return db
+
+    async def _is_alive(self, db: aiosqlite.Connection) -> bool:
+        try:
+            await db.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def acquire(self) -> aiosqlite.Connection:
+        started = time.monotonic()
+        waited = False
+
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Пул соединений закрыт")
+                if self._idle:
+                    db, idle_since = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    db, idle_since = None, None
+                    break
+                waited = True
+                self._waiting += 1
+                try:
+                    await self._cond.wait()
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        wait_time = time.monotonic() - started
+
+        try:
+            if db is None:
+                db = await self._connect()
+            elif time.monotonic() - idle_since > self.health_check_interval and not await self._is_alive(db):
+                logger.warning("⚠️ SQLite connection failed health check, reconnecting")
+                self._reconnects += 1
+                await self._close_quietly(db)
+                db = await self._connect()
+        except BaseException:
+            async with self._cond:
+                self._in_use -= 1
+                self._opened -= 1
+                self._cond.notify()
+            raise
+
+        self._leases += 1
+        if waited:
+            self._waits += 1
+        self._wait_time_total += wait_time
+        self._wait_time_max = max(self._wait_time_max, wait_time)
+        return db
+
+    async def release(self, db: aiosqlite.Connection) -> None:
+        broken = False
+        try:
+            # Незакоммиченные изменения не должны перейти к следующему владельцу
+            if db.in_transaction:
+                await db.rollback()
+            db.row_factory = aiosqlite.Row
+        except Exception:
+            broken = True
+
+        async with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._opened -= 1
+            else:
+                self._idle.append((db, time.monotonic()))
+            self._cond.notify()
+
+        if broken or self._closed:
+            await self._close_quietly(db)
+
+    async def close(self) -> None:
+        async with self._cond:
+            self._closed = True
+            idle = [db for db, _ in self._idle]
+            self._idle.clear()
+            self._opened -= len(idle)
+            self._cond.notify_all()
+
+        for db in idle:
+            await self._close_quietly(db)
+
+    @staticmethod
+    async def _close_quietly(db: aiosqlite.Connection) -> None:
+        try:
+            await db.close()
+        except Exception:
+            logger.exception("Failed to close SQLite connection")
+
+    def stats(self) -> dict:
+        return {
+            "readonly": self.readonly,
+            "size": self.size,
+            "opened": self._opened,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "waiting": self._waiting,
+            "utilisation": round(self._in_use / self.size, 3),
+            "leases": self._leases,
+            "waits": self._waits,
+            "wait_time_avg_ms": round(self._wait_time_total / self._leases * 1000, 3) if self._leases else 0.0,
+            "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+            "reconnects": self._reconnects,
+        }
+
+
+_pool: ConnectionPool | None = None
+_read_pool: ConnectionPool | None = None
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Пул для записи. В режиме WAL это единственное соединение-писатель,
+    поэтому все записи сериализуются.
+    """
+    global _pool
+    if _pool is None:
+        if settings.DB_WAL_MODE:
+            _pool = ConnectionPool(
+                DB_PATH,
+                size=1,
+                health_check_interval=settings.DB_POOL_HEALTHCHECK_INTERVAL,
+                pragmas=("PRAGMA journal_mode=WAL;", "PRAGMA synchronous=NORMAL;"),
+            )
+        else:
+            _pool = ConnectionPool(
+                DB_PATH,
+                size=settings.DB_POOL_SIZE,
+                health_check_interval=settings.DB_POOL_HEALTHCHECK_INTERVAL,
+            )
+    return _pool
+
+
+def get_read_pool() -> ConnectionPool:
+    """Пул read-only соединений (mode=ro). Без WAL совпадает с основным пулом."""
+    global _read_pool
+    if not settings.DB_WAL_MODE:
+        return get_pool()
+    if _read_pool is None:
+        _read_pool = ConnectionPool(
+            DB_PATH,
+            size=settings.DB_POOL_SIZE,
+            health_check_interval=settings.DB_POOL_HEALTHCHECK_INTERVAL,
+            readonly=True,
+        )
+    return _read_pool
+
+
+def get_pool_stats() -> dict:
+    """Счётчики пулов: ожидание выдачи соединения и загрузка."""
+    stats = {"writer": get_pool().stats()}
+    if settings.DB_WAL_MODE:
+        stats["readers"] = get_read_pool().stats()
+    return stats
+
+
+async def close_db_pool():
+    global _pool, _read_pool
+    if _read_pool is not None:
+        await _read_pool.close()
+        _read_pool = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# Запись всех SQL-запросов, прошедших через get_db_connection()
+# (используется db/index_advisor.py)
+_sql_capture: list[str] | None = None
+
+
+def start_sql_capture():
+    global _sql_capture
+    _sql_capture = []
+
+
+def stop_sql_capture() -> list[str]:
+    global _sql_capture
+    captured, _sql_capture = _sql_capture or [], None
+    return captured
+
+
 @asynccontextmanager
-async def get_db_connection():
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
-    await db.execute("PRAGMA busy_timeout=5000;")
-    await db.execute("PRAGMA foreign_keys=ON;")
+async def get_db_connection(readonly: bool = False):
+    """
+    readonly=True — запрос только читает данные; в режиме WAL
+    он уходит на read-only соединение и не ждёт писателя.
+    """
+    pool = get_read_pool() if readonly else get_pool()
+    db = await pool.acquire()
+    capture = _sql_capture
     try:
+        if capture is not None:
+            await db.set_trace_callback(capture.append)
         yield db
     finally:
-        await db.close()
+        if capture is not None:
+            await db.set_trace_callback(None)
+        await pool.release(db)
+
+
+async def checkpoint_wal():
+    """
+    Периодический checkpoint WAL: PASSIVE не блокирует читателей,
+    TRUNCATE выполняется, только если журнал разросся.
+    """
+    if not settings.DB_WAL_MODE:
+        return
+
+    async with get_db_connection() as db:
+        cur = await db.execute("PRAGMA wal_checkpoint(PASSIVE);")
+        busy, log_pages, checkpointed = await cur.fetchone()
+
+        if log_pages > settings.DB_WAL_TRUNCATE_PAGES:
+            cur = await db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            busy, log_pages, checkpointed = await cur.fetchone()
+
+    logger.info(
+        "WAL checkpoint: busy=%s log_pages=%s checkpointed=%s",
+        busy, log_pages, checkpointed
+    )
 
 def ensure_db_directory():
     db_dir = os.path.dirname(DB_PATH)
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
-        
+
 async def table_exists(db, table_name: str) -> bool:
     cur = await db.execute(
         "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
@@ -50,7 +322,7 @@ async def db_health_check():
         "variants",
     }
 
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute(
             "SELECT name FROM sqlite_master WHERE type='table'"
         )
@@ -60,4 +332,4 @@ async def db_health_check():
     if missing:
         raise RuntimeError(f"❌ Missing DB tables: {missing}")
 
-    print("✅ DB health check passed")
\ No newline at end of file
+    print("✅ DB health check passed")
@@ -0,0 +1,63 @@
+"""
+Реестр рекламных кампаний (блогеры и т.п.) для атрибуции /start.
+
+Таблица campaigns целиком держится в памяти и перечитывается после
+каждой записи, поэтому /start не делает запросов к БД.
+"""
+import logging
+
+from .base import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGNS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    traffic_source TEXT NOT NULL,
+    creator_id INTEGER NOT NULL DEFAULT 0,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+_campaigns: dict[int, dict] = {}
+
+
+def get_campaign(campaign_id: int) -> dict | None:
+    """Только активные кампании."""
+    return _campaigns.get(campaign_id)
+
+
+async def load_campaigns():
+    global _campaigns
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("""
+            SELECT id, name, traffic_source, creator_id
+            FROM campaigns
+            WHERE is_active = 1
+        """)
+        campaigns = {row["id"]: dict(row) for row in await cur.fetchall()}
+
+    # Подмена одной операцией присваивания, как у снимка каталога
+    _campaigns = campaigns
+    logger.info("Campaigns loaded: %s", len(campaigns))
+
+
+async def create_campaign(name: str, traffic_source: str, creator_id: int = 0) -> int:
+    async with get_db_connection() as db:
+        cur = await db.execute(
+            "INSERT INTO campaigns (name, traffic_source, creator_id) VALUES (?, ?, ?)",
+            (name, traffic_source, creator_id)
+        )
+        campaign_id = cur.lastrowid
+        await db.commit()
+    await load_campaigns()
+    return campaign_id
+
+
+async def set_campaign_active(campaign_id: int, is_active: int):
+    async with get_db_connection() as db:
+        await db.execute("UPDATE campaigns SET is_active = ? WHERE id = ?", (is_active, campaign_id))
+        await db.commit()
+    await load_campaigns()
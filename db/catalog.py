@@ -0,0 +1,172 @@
+"""
+In-memory снимок каталога (банки, продукты, варианты, условия, реферальные
+ссылки) для пользовательских хендлеров: выбор банка/продукта/варианта
+и сборка ссылки не ходят в SQLite.
+
+Снимок неизменяемый и заменяется целиком одной операцией присваивания,
+поэтому читатели никогда не видят наполовину обновлённый каталог.
+Каталог меняется только через админку: каждая функция записи после
+commit вызывает refresh_catalog().
+"""
+import asyncio
+import logging
+from collections import defaultdict
+
+from .base import get_db_connection
+from .link_templates import LinkTemplate
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    def __init__(
+        self,
+        version: int,
+        banks: list[dict],
+        products: dict[str, list[dict]],
+        variants: dict[tuple[str, str], list[dict]],
+        conditions: dict[tuple[str, str], list[dict]],
+        links: dict[tuple[str, str, str | None], LinkTemplate],
+    ):
+        self.version = version
+        self._banks = banks
+        self._products = products
+        self._variants = variants
+        self._conditions = conditions
+        self._links = links
+
+        self._products_by_id = {p["id"]: p for items in products.values() for p in items}
+        self._variants_by_id = {v["id"]: v for items in variants.values() for v in items}
+
+    def active_banks(self) -> list[dict]:
+        """Как db.banks.get_active_banks()."""
+        return self._banks
+
+    def bank_by_title(self, bank_title: str) -> dict | None:
+        return next((b for b in self._banks if b["bank_title"] == bank_title), None)
+
+    def products(self, bank_key: str) -> list[dict]:
+        """Как db.products.get_products_by_bank()."""
+        return self._products.get(bank_key, [])
+
+    def product(self, bank_key: str, product_key: str) -> dict | None:
+        return next((p for p in self.products(bank_key) if str(p["product_key"]) == product_key), None)
+
+    def product_by_id(self, product_id: int) -> dict | None:
+        return self._products_by_id.get(product_id)
+
+    def variant_by_id(self, variant_id: int) -> dict | None:
+        """Вариант вместе с bank_key и product_key."""
+        return self._variants_by_id.get(variant_id)
+
+    def variants(self, bank_key: str, product_key: str) -> list[dict]:
+        """Как db.variants.get_variants()."""
+        return self._variants.get((bank_key, product_key), [])
+
+    def conditions(self, type_: str, related_key: str) -> list[dict]:
+        """Как db.conditions.get_conditions(): только активные условия."""
+        return self._conditions.get((type_, str(related_key)), [])
+
+    def link_template(self, bank_key: str, product_key: str, variant_key: str | None = None) -> LinkTemplate | None:
+        """Ссылка варианта, иначе общая ссылка продукта — как db.referrals.get_referral_link()."""
+        template = self._links.get((bank_key, product_key, variant_key)) if variant_key else None
+        return template or self._links.get((bank_key, product_key, None))
+
+    def referral_url(self, bank_key: str, product_key: str, variant_key: str | None, traffic_source: str) -> str | None:
+        template = self.link_template(bank_key, product_key, variant_key)
+        if template is None:
+            return None
+        return template.render(traffic_source, variant_key or product_key)
+
+    def link_targets(self) -> list[tuple[str, str, str | None]]:
+        """Все (bank_key, product_key, variant_key), для которых есть ссылка."""
+        targets = set(self._links)
+        for (bank_key, product_key), variants in self._variants.items():
+            if (bank_key, product_key, None) in self._links:
+                targets.update((bank_key, product_key, v["variant_key"]) for v in variants)
+        return sorted(targets, key=lambda t: (t[0], t[1], t[2] or ""))
+
+
+_snapshot: CatalogSnapshot | None = None
+_refresh_lock = asyncio.Lock()
+
+
+def get_catalog() -> CatalogSnapshot:
+    if _snapshot is None:
+        raise RuntimeError("Каталог не загружен: вызовите load_catalog() при старте")
+    return _snapshot
+
+
+async def _read_snapshot(version: int) -> CatalogSnapshot:
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("""
+            SELECT bank_key, bank_title, bank_name
+            FROM banks
+            WHERE is_active = 1
+        """)
+        banks = [dict(row) for row in await cur.fetchall()]
+
+        cur = await db.execute("""
+            SELECT id, bank_key, product_key, product_name AS title, is_active
+            FROM products
+        """)
+        products = defaultdict(list)
+        for row in await cur.fetchall():
+            products[row["bank_key"]].append(dict(row))
+
+        cur = await db.execute("""
+            SELECT id, bank_key, product_key, variant_key, title
+            FROM variants
+            ORDER BY id
+        """)
+        variants = defaultdict(list)
+        for row in await cur.fetchall():
+            variants[(row["bank_key"], row["product_key"])].append(dict(row))
+
+        cur = await db.execute("""
+            SELECT id, text, type, related_key, active
+            FROM conditions
+            WHERE active = 1
+            ORDER BY id
+        """)
+        conditions = defaultdict(list)
+        for row in await cur.fetchall():
+            conditions[(row["type"], str(row["related_key"]))].append(dict(row))
+
+        cur = await db.execute("""
+            SELECT bank_key, product_key, variant_key, base_url
+            FROM referral_links
+            WHERE is_active = 1
+            ORDER BY rowid DESC
+        """)
+        # NULL в variant_key не участвует в уникальности, поэтому у продукта
+        # может быть несколько общих ссылок; как и LIMIT 1 в get_referral_link,
+        # побеждает самая ранняя (она записывается в словарь последней)
+        links = {
+            (row["bank_key"], row["product_key"], row["variant_key"]): LinkTemplate(row["base_url"])
+            for row in await cur.fetchall()
+        }
+
+    return CatalogSnapshot(version, banks, dict(products), dict(variants), dict(conditions), links)
+
+
+async def load_catalog() -> CatalogSnapshot:
+    """Читает каталог из БД и атомарно подменяет снимок."""
+    global _snapshot
+    # Под блокировкой: при параллельных правках последним
+    # устанавливается снимок, прочитанный последним
+    async with _refresh_lock:
+        version = _snapshot.version + 1 if _snapshot else 1
+        _snapshot = await _read_snapshot(version)
+
+    logger.info("Catalog snapshot v%s loaded", version)
+    return _snapshot
+
+
+async def refresh_catalog():
+    """Write-through: вызывается после каждой записи в таблицы каталога."""
+    try:
+        await load_catalog()
+    except Exception as e:
+        # Старый снимок остаётся в силе, запись в БД уже закоммичена
+        logger.error(f"❌ Catalog refresh error: {e}")
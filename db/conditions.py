@@ -1,7 +1,8 @@
 from .base import get_db_connection
+from .catalog import refresh_catalog
 
 async def get_conditions(type_: str, related_key: str):
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cursor = await db.execute(
             "SELECT id, text, type, related_key, active FROM conditions WHERE type = ? AND related_key = ? AND active = 1",
             (type_, related_key)
@@ -18,6 +19,7 @@ async def save_condition(text: str, type_: str, related_key: str, active: int =
             (text, type_, related_key, active)
         )
         await db.commit()
+    await refresh_catalog()
 
 
 # -------------------- Обновление условия --------------------
@@ -28,6 +30,7 @@ async def update_condition(cond_id: int, new_text: str):
             (new_text, cond_id)
         )
         await db.commit()
+    await refresh_catalog()
 
 
 # -------------------- Удаление условия --------------------
@@ -38,5 +41,6 @@ async def delete_condition(cond_id: int):
             (cond_id,)
         )
         await db.commit()
+    await refresh_catalog()
         
 
@@ -1,5 +1,6 @@
 from typing import List, Dict
 from .base import get_db_connection
+from .rollups import get_users_by_source, get_products_selected_by_source
 
 # =========================
 # ADMIN FINANCE — SUMMARY
@@ -10,7 +11,7 @@ async def get_admin_finance_summary(days: int = 30) -> Dict:
     Возвращает сводку по пользователям и количеству заявок.
     Доход и статусы не учитываются.
     """
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute("SELECT COUNT(DISTINCT user_id) AS total_users FROM users")
         row = await cur.fetchone()
         return {
@@ -28,7 +29,7 @@ async def get_admin_finance_details() -> List[Dict]:
     Детальный список заявок из таблицы applications
     без статусов и доходов.
     """
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("""
             SELECT id, user_id, bank_key, product_key, variant_key, created_at
             FROM applications
@@ -44,38 +45,17 @@ async def get_admin_finance_details() -> List[Dict]:
 async def get_admin_traffic_overview() -> List[Dict]:
     """
     Подсчёт пользователей и уникальных продуктов по источникам трафика.
-    Учитывает variant_key.
+    Учитывает variant_key. Читает дневные роллапы, а не сырые таблицы.
     """
-    async with get_db_connection() as db:
-        async with db.execute("""
-            SELECT traffic_source, COUNT(DISTINCT user_id) AS users
-            FROM users
-            GROUP BY traffic_source
-        """) as cursor:
-            users_data = await cursor.fetchall()
-
-        async with db.execute("""
-            SELECT a.user_id, a.product_key, a.variant_key, u.traffic_source
-            FROM applications a
-            LEFT JOIN users u ON a.user_id = u.user_id
-        """) as cursor:
-            apps_data = await cursor.fetchall()
+    users_by_source = await get_users_by_source()
+    products_by_source = await get_products_selected_by_source()
 
     overview = {}
-    for row in users_data:
-        overview[row["traffic_source"]] = {"users": row["users"], "products_selected": 0}
-
-    products_by_source = {}
-    for app in apps_data:
-        source = app["traffic_source"] or "unknown"
-        key = (app["product_key"], app["variant_key"])
-        products_by_source.setdefault(source, set()).add(key)
+    for source, users in users_by_source.items():
+        overview[source] = {"users": users, "products_selected": 0}
 
     for source, products in products_by_source.items():
-        if source in overview:
-            overview[source]["products_selected"] = len(products)
-        else:
-            overview[source] = {"users": 0, "products_selected": len(products)}
+        overview.setdefault(source, {"users": 0})["products_selected"] = products
 
     return [{"traffic_source": k, **v} for k, v in overview.items()]
 
@@ -88,7 +68,7 @@ async def get_admin_traffic_finance_projection() -> Dict:
     Подсчёт общего количества пользователей.
     Доходы больше не учитываются.
     """
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute("SELECT COUNT(DISTINCT user_id) AS total_users FROM users")
         row = await cur.fetchone()
         total_users = row["total_users"] if row else 0
@@ -102,7 +82,7 @@ async def get_user_applications(user_id: int) -> List[Dict]:
     """
     Список всех заявок пользователя.
     """
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("""
             SELECT id, bank_key, product_key, variant_key, created_at
             FROM applications
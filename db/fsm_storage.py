@@ -0,0 +1,239 @@
+"""
+FSM-хранилище aiogram поверх основной SQLite-базы.
+
+Горячий слой — словарь в памяти: чтение состояния обычно не ходит в БД.
+Изменения помечают ключ «грязным»; раз в FSM_FLUSH_INTERVAL_MS все грязные
+ключи уходят одной пачкой через write-behind очередь, поэтому несколько
+update_data() в одном хендлере дают одну запись. Если пачка не записалась,
+её ключи снова становятся грязными. Записи, к которым не обращались
+FSM_HOT_TTL секунд, выгружаются из памяти (кроме ещё не закоммиченных),
+а строки старше FSM_STATE_TTL удаляются из таблицы (evict(), вызывается
+по расписанию).
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+from config import settings
+from .base import get_db_connection
+from .write_behind import submit_write
+
+logger = logging.getLogger(__name__)
+
+FSM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm_states (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    updated_at INTEGER NOT NULL
+)
+"""
+
+
+class _Record:
+    __slots__ = ("state", "data", "touched")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[dict] = None):
+        self.state = state
+        self.data = data or {}
+        self.touched = time.monotonic()
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        flush_interval_ms: int = settings.FSM_FLUSH_INTERVAL_MS,
+        hot_ttl: float = settings.FSM_HOT_TTL,
+        hot_max: int = settings.FSM_HOT_MAX,
+        state_ttl: int = settings.FSM_STATE_TTL,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.hot_ttl = hot_ttl
+        self.hot_max = max(1, hot_max)
+        self.state_ttl = state_ttl
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+
+        self._hot: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        # ключ -> число его записей в write-behind очереди, ещё не закоммиченных
+        self._inflight: dict[str, int] = {}
+        self._closed = False
+        self._flush_task: asyncio.Task | None = None
+
+        # счётчики
+        self._hits = 0
+        self._loads = 0
+        self._flushes = 0
+        self._written = 0
+        self._failed = 0
+
+    # ---------- hot tier ----------
+    async def _record(self, key: StorageKey) -> tuple[str, _Record]:
+        db_key = self.key_builder.build(key)
+        record = self._hot.get(db_key)
+        if record is not None:
+            self._hits += 1
+            self._hot.move_to_end(db_key)
+            record.touched = time.monotonic()
+            return db_key, record
+
+        self._loads += 1
+        async with get_db_connection(readonly=True) as db:
+            cur = await db.execute("SELECT state, data FROM fsm_states WHERE key = ?", (db_key,))
+            row = await cur.fetchone()
+
+        # Пока шёл запрос, ключ мог появиться в памяти — он свежее
+        record = self._hot.get(db_key)
+        if record is None:
+            record = _Record(row["state"], json.loads(row["data"])) if row else _Record()
+            self._hot[db_key] = record
+            self._trim()
+        return db_key, record
+
+    def _pinned(self, db_key: str) -> bool:
+        # Грязные и ещё не закоммиченные записи не выгружаем: чтение из БД
+        # вернуло бы старую строку
+        return db_key in self._dirty or db_key in self._inflight
+
+    def _trim(self):
+        while len(self._hot) > self.hot_max:
+            for db_key in self._hot:
+                if not self._pinned(db_key):
+                    del self._hot[db_key]
+                    break
+            else:
+                return
+
+    def _mark_dirty(self, db_key: str):
+        self._dirty.add(db_key)
+        if self._closed:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self, wait: bool = False):
+        """Отправляет все грязные ключи одной пачкой в write-behind очередь."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        now = int(time.time())
+
+        statements = []
+        for db_key in dirty:
+            record = self._hot.get(db_key)
+            if record is None or (record.state is None and not record.data):
+                statements.append(("DELETE FROM fsm_states WHERE key = ?", (db_key,)))
+            else:
+                statements.append((
+                    """
+                    INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                    """,
+                    (db_key, record.state, json.dumps(record.data, ensure_ascii=False), now)
+                ))
+
+        for db_key in dirty:
+            self._inflight[db_key] = self._inflight.get(db_key, 0) + 1
+
+        self._flushes += 1
+        self._written += len(statements)
+        handle = submit_write(statements)
+        handle.add_done_callback(lambda future: self._on_flushed(dirty, future))
+        if wait:
+            await asyncio.shield(handle)
+
+    def _on_flushed(self, keys: set[str], future: asyncio.Future):
+        for db_key in keys:
+            left = self._inflight.pop(db_key, 1) - 1
+            if left > 0:
+                self._inflight[db_key] = left
+
+        if not future.cancelled() and future.result():
+            return
+        self._failed += 1
+        logger.error("FSM storage flush of %s keys failed, will retry", len(keys))
+        # Запись в памяти — самая свежая версия, её и пишем повторно
+        for db_key in keys:
+            self._mark_dirty(db_key)
+
+    # ---------- BaseStorage ----------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(db_key)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        db_key, record = await self._record(key)
+        record.data = data.copy()
+        self._mark_dirty(db_key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, record = await self._record(key)
+        return record.data.copy()
+
+    async def set_record(self, key: StorageKey, state: StateType, data: Dict[str, Any]) -> None:
+        """Состояние и данные за одно обращение (см. middlewares/fsm_context.py)."""
+        db_key, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        record.data = data.copy()
+        self._mark_dirty(db_key)
+
+    async def close(self) -> None:
+        # После закрытия неудачная запись не планирует повтор: очередь
+        # write-behind останавливается следом
+        self._closed = True
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush(wait=True)
+        if self._dirty:
+            logger.error("FSM storage closed with %s unsaved keys", len(self._dirty))
+
+    # ---------- maintenance ----------
+    async def evict(self):
+        """Выгружает простаивающие записи из памяти и удаляет устаревшие из БД."""
+        deadline = time.monotonic() - self.hot_ttl
+        for db_key in [k for k, r in self._hot.items() if r.touched < deadline and not self._pinned(k)]:
+            del self._hot[db_key]
+
+        async with get_db_connection() as db:
+            cur = await db.execute(
+                "DELETE FROM fsm_states WHERE updated_at < ? RETURNING key",
+                (int(time.time()) - self.state_ttl,)
+            )
+            deleted = [row["key"] for row in await cur.fetchall()]
+            await db.commit()
+
+        # Пользователь активен (запись в памяти), но данные давно не менялись —
+        # строку возвращаем при следующем сбросе
+        for db_key in deleted:
+            if db_key in self._hot:
+                self._mark_dirty(db_key)
+
+    def stats(self) -> dict:
+        return {
+            "hot": len(self._hot),
+            "dirty": len(self._dirty),
+            "inflight": len(self._inflight),
+            "hits": self._hits,
+            "loads": self._loads,
+            "flushes": self._flushes,
+            "written": self._written,
+            "failed": self._failed,
+        }
@@ -0,0 +1,252 @@
+"""
+Index advisor: прогоняет запросы из db/*.py (и отчётов) на засеянной базе,
+собирает весь SQL, прошедший через get_db_connection(), и выполняет
+EXPLAIN QUERY PLAN для каждого запроса. Полные сканы и временные B-деревья
+попадают в отчёт.
+
+Запуск:
+    python -m db.index_advisor [--db PATH] [--users N] [--applications N] [--schema-version N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from . import base
+from .migrations import run_migrations
+from .sketches import rebuild_sketches
+
+BANKS = 3
+PRODUCTS_PER_BANK = 8
+VARIANTS_PER_PRODUCT = 4
+SOURCES = ["organic", "tiktok", "yt", "tg", "ads", "vk", "blogger"]
+
+FULL_SCAN = "full scan"
+TEMP_BTREE = "temp b-tree"
+
+# Находки, которые неизбежны: экспорты по определению читают всю таблицу,
+# а агрегаты с GROUP BY / COUNT(DISTINCT) / сортировкой по агрегату
+# строят временное B-дерево; banks — справочник из единиц строк,
+# по нему планировщик всегда выбирает скан; роллапы (db/rollups.py)
+# читаются целиком, но это O(дни × измерения), а не O(истории)
+EXPECTED = {
+    "get_active_banks": {FULL_SCAN},
+    "get_bank_by_name": {FULL_SCAN},
+    "get_all_products": {FULL_SCAN, TEMP_BTREE},
+    "get_admin_finance_details": {FULL_SCAN},
+    "get_all_applications": {FULL_SCAN},
+    "build_referrer_report": {FULL_SCAN},
+    "get_admin_traffic_overview": {FULL_SCAN, TEMP_BTREE},
+    "get_admin_finance_summary": {FULL_SCAN},
+    "get_admin_users_page": {FULL_SCAN, TEMP_BTREE},
+    "generate_admin_dashboard_text": {FULL_SCAN, TEMP_BTREE},
+    "generate_weekly_snapshot": {TEMP_BTREE},
+    "build_weekly_traffic_report": {TEMP_BTREE},
+}
+
+
+# =========================
+# SEED
+# =========================
+async def seed(users: int, applications: int):
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+
+    async with base.get_db_connection() as db:
+        await db.executemany(
+            "INSERT INTO banks (bank_key, bank_name, bank_title, is_active) VALUES (?, ?, ?, 1)",
+            [(f"bank_{b}", f"Bank {b}", f"Bank {b}") for b in range(BANKS)]
+        )
+        products, variants, links, conditions = [], [], [], []
+        for b in range(BANKS):
+            for p in range(PRODUCTS_PER_BANK):
+                products.append((f"bank_{b}", f"product_{p}", f"Product {p}", 1))
+                links.append((f"bank_{b}", f"product_{p}", None, "https://example.com/offer?ref=1"))
+                conditions.append((f"Condition {p}", "product", f"product_{p}", 1))
+                for v in range(VARIANTS_PER_PRODUCT):
+                    variants.append((f"bank_{b}", f"product_{p}", f"variant_{p}_{v}", f"Variant {v}", 1))
+                    links.append((f"bank_{b}", f"product_{p}", f"variant_{p}_{v}", "https://example.com/offer?ref=2"))
+                    conditions.append((f"Condition {p}/{v}", "variant", f"variant_{p}_{v}", 1))
+
+        await db.executemany(
+            "INSERT INTO products (bank_key, product_key, product_name, is_active) VALUES (?, ?, ?, ?)",
+            products
+        )
+        await db.executemany(
+            "INSERT INTO variants (bank_key, product_key, variant_key, title, is_active) VALUES (?, ?, ?, ?, ?)",
+            variants
+        )
+        await db.executemany(
+            "INSERT INTO referral_links (bank_key, product_key, variant_key, base_url) VALUES (?, ?, ?, ?)",
+            links
+        )
+        await db.executemany(
+            "INSERT INTO conditions (text, type, related_key, active) VALUES (?, ?, ?, ?)",
+            conditions
+        )
+        await db.executemany(
+            "INSERT INTO users (user_id, full_name, traffic_source, created_at) VALUES (?, ?, ?, ?)",
+            [
+                (uid, "Иван Иванов", rnd.choice(SOURCES), f"{now - timedelta(days=rnd.randint(0, 365)):%Y-%m-%d %H:%M:%S}")
+                for uid in range(1, users + 1)
+            ]
+        )
+
+        def application_rows():
+            for _ in range(applications):
+                b, p, v = rnd.randrange(BANKS), rnd.randrange(PRODUCTS_PER_BANK), rnd.randrange(VARIANTS_PER_PRODUCT)
+                created = f"{now - timedelta(minutes=rnd.randint(0, 365 * 24 * 60)):%Y-%m-%d %H:%M:%S}"
+                yield (rnd.randint(1, users), f"bank_{b}", f"product_{p}", f"variant_{p}_{v}", rnd.choice(SOURCES), created, created)
+
+        await db.executemany(
+            """
+            INSERT INTO applications (user_id, bank_key, product_key, variant_key, traffic_source, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            application_rows()
+        )
+        await db.commit()
+        # Скетчи, в отличие от роллапов, пишутся из Python, а не триггерами
+        await rebuild_sketches(db)
+        await db.execute("ANALYZE")
+        await db.commit()
+
+
+# =========================
+# WORKLOAD
+# =========================
+def workload():
+    from db import (
+        admin_applications, admin_users, applications, banks, conditions,
+        finance, products, referrals, short_links, users, variants,
+    )
+    from jobs.weekly_aggregator import generate_weekly_snapshot
+    from services import referrer_report_generator as reports
+
+    return [
+        ("get_active_banks", lambda: banks.get_active_banks()),
+        ("get_bank_by_name", lambda: banks.get_bank_by_name("Bank 1")),
+        ("get_products_by_bank", lambda: products.get_products_by_bank("bank_1")),
+        ("get_user_products", lambda: products.get_user_products(10)),
+        ("get_all_products", lambda: products.get_all_products()),
+        ("get_variant", lambda: variants.get_variant("bank_1", "product_2", "variant_2_1")),
+        ("get_variants", lambda: variants.get_variants("bank_1", "product_2")),
+        ("get_all_variants", lambda: variants.get_all_variants("bank_1", "product_2")),
+        ("get_variants_by_product", lambda: variants.get_variants_by_product("bank_1", "product_2")),
+        ("generate_variant_key", lambda: variants.generate_variant_key("bank_1", "product_2", "Variant")),
+        ("get_conditions", lambda: conditions.get_conditions("variant", "variant_2_1")),
+        ("get_referral_link", lambda: referrals.get_referral_link("bank_1", "product_2", "variant_2_1")),
+        ("lookup_short_link", lambda: short_links.lookup_short_link("https://example.com/offer?ref=2")),
+        ("user_exists", lambda: users.user_exists(10)),
+        ("get_user", lambda: users.get_user(10)),
+        ("get_user_full_data", lambda: users.get_user_full_data(10)),
+        ("get_admin_finance_summary", lambda: finance.get_admin_finance_summary()),
+        ("get_admin_finance_details", lambda: finance.get_admin_finance_details()),
+        ("get_admin_traffic_overview", lambda: finance.get_admin_traffic_overview()),
+        ("get_admin_traffic_finance_projection", lambda: finance.get_admin_traffic_finance_projection()),
+        ("get_user_applications", lambda: finance.get_user_applications(10)),
+        ("get_application_by_id", lambda: applications.get_application_by_id(10)),
+        ("get_applications_by_user", lambda: applications.get_applications_by_user(10)),
+        ("get_applications_by_bank", lambda: applications.get_applications_by_bank("bank_1")),
+        ("get_recent_applications", lambda: applications.get_recent_applications(7)),
+        ("get_all_applications", lambda: applications.get_all_applications()),
+        ("get_admin_users_page", lambda: admin_users.get_admin_users_page()),
+        ("get_user_applications_page", lambda: admin_applications.get_user_applications_page(10)),
+        ("generate_weekly_snapshot", lambda: generate_weekly_snapshot()),
+        ("generate_admin_dashboard_text", lambda: reports.generate_admin_dashboard_text()),
+        ("build_referrer_report", lambda: reports.build_referrer_report()),
+        ("build_weekly_traffic_report", lambda: reports.build_weekly_traffic_report(4)),
+    ]
+
+
+def _is_query(sql: str) -> bool:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    return head in {"SELECT", "WITH", "UPDATE", "DELETE", "INSERT"}
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+async def explain(sql: str) -> list[str]:
+    async with base.get_db_connection(readonly=True) as db:
+        cur = await db.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[3] for row in await cur.fetchall()]
+
+
+def findings(plan: list[str]) -> set[str]:
+    issues = set()
+    for detail in plan:
+        if detail.startswith("SCAN ") and "CONSTANT ROW" not in detail:
+            issues.add(FULL_SCAN)
+        if "USE TEMP B-TREE" in detail:
+            issues.add(TEMP_BTREE)
+    return issues
+
+
+async def advise() -> int:
+    problems = 0
+    seen = set()
+
+    for label, call in workload():
+        base.start_sql_capture()
+        try:
+            await call()
+        finally:
+            captured = base.stop_sql_capture()
+
+        for sql in captured:
+            if not _is_query(sql):
+                continue
+            key = _normalize(sql)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            plan = await explain(sql)
+            issues = findings(plan)
+            unexpected = issues - EXPECTED.get(label, set())
+            if unexpected:
+                status = "FLAG " + ", ".join(sorted(unexpected))
+                problems += 1
+            else:
+                status = "EXPECTED" if issues else "OK"
+
+            print(f"[{status}] {label}: {key[:160]}")
+            for detail in plan:
+                print(f"    {detail}")
+
+    print(f"\n{len(seen)} statements analysed, {problems} flagged")
+    return problems
+
+
+async def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="путь к временной базе (по умолчанию — tmp-файл)")
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--applications", type=int, default=100_000)
+    parser.add_argument("--schema-version", type=int, default=None, help="применить миграции только до этой версии")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="index_advisor_"), "advisor.db")
+    if os.path.exists(path):
+        raise SystemExit(f"{path} уже существует — advisor работает только на чистой базе")
+
+    await base.close_db_pool()
+    base.DB_PATH = path
+
+    try:
+        await run_migrations(target=args.schema_version)
+        await seed(args.users, args.applications)
+        problems = await advise()
+    finally:
+        await base.close_db_pool()
+
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,106 +1,11 @@
-from .base import get_db_connection
+from .base import ensure_db_directory
+from .migrations import run_migrations
 
 
 async def initialize_database():
-    async with get_db_connection() as db:
-        await db.execute("PRAGMA busy_timeout=5000;")
-        await db.execute("PRAGMA foreign_keys=ON;")
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            full_name TEXT NOT NULL,
-            traffic_source TEXT DEFAULT 'organic',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-            #future-ready
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS referral_progress (
-            user_id INTEGER PRIMARY KEY,
-            card_received INTEGER DEFAULT 0,
-            card_activated INTEGER DEFAULT 0,
-            card_received_date DATETIME,
-            card_activated_date DATETIME,
-            FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
-        )
-        """)
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS conditions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            text TEXT NOT NULL,
-            type TEXT NOT NULL,
-            related_key INTEGER NOT NULL,
-            active TEXT DEFAULT 0
-        )
-        """)
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS referral_links (
-            bank_key TEXT NOT NULL,
-            product_key TEXT NOT NULL,
-            variant_key TEXT NULL,
-            base_url TEXT NOT NULL,
-            utm_source TEXT,
-            utm_medium TEXT,
-            utm_campaign TEXT,
-            is_active INTEGER DEFAULT 1,
-            updated_at DATETIME,
-            PRIMARY KEY (bank_key, product_key, variant_key)
-        )
-        """)
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bank_key TEXT NOT NULL,
-            product_key TEXT NOT NULL,
-            product_name TEXT NOT NULL,
-            description TEXT,
-            is_active INTEGER DEFAULT 0,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE (bank_key, product_key)
-        )
-        """)
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS variants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bank_key TEXT NOT NULL,
-            product_key TEXT NOT NULL,
-            variant_key TEXT NOT NULL,
-            title TEXT NOT NULL,
-            description TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE (bank_key, product_key, variant_key)
-        )
-        """)
-            #future-ready
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS applications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            bank_key TEXT NOT NULL,
-            product_key TEXT NOT NULL,
-            variant_key TEXT DEFAULT '',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS banks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            bank_key TEXT NOT NULL UNIQUE,
-            bank_name TEXT NOT NULL,
-            bank_title TEXT NOT NULL,
-            is_active INTEGER NOT NULL DEFAULT 1
-        )
-        """)
-
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_applications_user_id ON applications(user_id)")
-
-        await db.commit()
\ No newline at end of file
+    """
+    Доводит схему до актуальной версии (см. db/migrations.py).
+    На актуальной базе — одно чтение schema_version.
+    """
+    ensure_db_directory()
+    await run_migrations()
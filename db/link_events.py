@@ -0,0 +1,58 @@
+"""
+Журнал выдачи ссылок и переходов по ним (только дописывается).
+
+Выдача ссылки в apply_offer пишет событие "issued" вместе со строкой
+applications (её подхватывают триггеры роллапов и HLL-скетчи) одной
+мутацией write-behind: хендлер не ждёт коммита. Переходы по коротким
+ссылкам собственного сокращателя пишутся как "clicked".
+"""
+import asyncio
+
+from .sketches import sketch_statement
+from .write_behind import submit_write
+
+LINK_EVENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS link_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event TEXT NOT NULL,
+    user_id INTEGER,
+    bank_key TEXT,
+    product_key TEXT,
+    variant_key TEXT,
+    traffic_source TEXT,
+    link_id INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+ISSUED = "issued"
+CLICKED = "clicked"
+
+
+def record_link_issued(
+    user_id: int,
+    bank_key: str,
+    product_key: str,
+    variant_key: str | None,
+    traffic_source: str | None
+) -> asyncio.Future:
+    return submit_write([
+        ("""
+            INSERT INTO link_events (event, user_id, bank_key, product_key, variant_key, traffic_source)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (ISSUED, user_id, bank_key, product_key, variant_key, traffic_source)),
+        ("""
+            INSERT INTO applications (
+                user_id, bank_key, product_key, variant_key, traffic_source, created_at, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        """, (user_id, bank_key, product_key, variant_key, traffic_source)),
+        sketch_statement(user_id, bank_key, traffic_source),
+    ])
+
+
+def click_event_statement(link_id: int):
+    return (
+        "INSERT INTO link_events (event, link_id) VALUES (?, ?)",
+        (CLICKED, link_id),
+    )
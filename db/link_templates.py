@@ -0,0 +1,49 @@
+"""
+Скомпилированные шаблоны реферальных ссылок.
+
+Строка referral_links разбирается один раз при загрузке каталога:
+query базовой ссылки кодируется заранее, а для utm_source/utm_medium/
+utm_campaign остаются слоты. Итоговая ссылка собирается конкатенацией
+строк, без urlparse/parse_qs/urlencode на каждый клик.
+"""
+from urllib.parse import parse_qs, quote_plus, urlparse, urlunparse
+
+UTM_SOURCE = "ReferralFlowBot"
+UTM_SLOTS = ("utm_source", "utm_medium", "utm_campaign")
+
+_MARKER = "\x00"
+
+
+class LinkTemplate:
+    """
+    render() даёт ту же строку, что и прежняя цепочка
+    get_referral_link() -> build_final_referral_url(): параметры базовой
+    ссылки в исходном порядке (первое значение, пустые отброшены), UTM-метки
+    на своих местах, если они уже были в ссылке, иначе — в конце.
+    """
+
+    __slots__ = ("base_url", "_head", "_tail", "_parts")
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+        parsed = urlparse(base_url)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items() if v}
+        for slot in UTM_SLOTS:
+            params.setdefault(slot, None)
+
+        # Литеральные пары кодируются сейчас, для UTM — индекс слота
+        self._parts: list[str | int] = [
+            f"{quote_plus(k)}={quote_plus(v)}" if k not in UTM_SLOTS else UTM_SLOTS.index(k)
+            for k, v in params.items()
+        ]
+        self._head, self._tail = urlunparse(parsed._replace(query=_MARKER)).split(_MARKER)
+
+    def render(self, traffic_source: str, campaign: str) -> str:
+        values = (
+            f"utm_source={UTM_SOURCE}",
+            f"utm_medium={quote_plus(traffic_source)}",
+            f"utm_campaign={quote_plus(campaign)}",
+        )
+        query = "&".join(values[p] if isinstance(p, int) else p for p in self._parts)
+        return f"{self._head}{query}{self._tail}"
@@ -0,0 +1,67 @@
+"""
+Короткие ссылки собственного сокращателя (services/shortener.py, backend "local").
+
+Код ссылки — base62 от id строки, поэтому по коду строка находится
+поиском по первичному ключу, а отдельная колонка с кодом не нужна.
+"""
+from utils import base62
+from .base import get_db_connection
+from .link_events import click_event_statement
+from .write_behind import submit_write
+
+LOCAL_LINKS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS local_links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    long_url TEXT NOT NULL UNIQUE,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_click_at DATETIME
+)
+"""
+
+
+async def issue_code(long_url: str) -> str:
+    """Код для URL; повторный вызов с тем же URL возвращает тот же код."""
+    async with get_db_connection() as db:
+        await db.execute(
+            "INSERT INTO local_links (long_url) VALUES (?) ON CONFLICT(long_url) DO NOTHING",
+            (long_url,)
+        )
+        cur = await db.execute("SELECT id FROM local_links WHERE long_url = ?", (long_url,))
+        row = await cur.fetchone()
+        await db.commit()
+    return base62.encode(row["id"])
+
+
+async def resolve_code(code: str) -> str | None:
+    try:
+        link_id = base62.decode(code)
+    except ValueError:
+        return None
+
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("SELECT long_url FROM local_links WHERE id = ?", (link_id,))
+        row = await cur.fetchone()
+    return row["long_url"] if row else None
+
+
+def record_click(code: str):
+    """Счётчик и событие перехода пишутся через write-behind, редирект их не ждёт."""
+    link_id = base62.decode(code)
+    submit_write([
+        (
+            "UPDATE local_links SET clicks = clicks + 1, last_click_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (link_id,)
+        ),
+        click_event_statement(link_id),
+    ])
+
+
+async def get_local_link_stats(limit: int = 20) -> list[dict]:
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute(
+            "SELECT id, long_url, clicks, last_click_at FROM local_links ORDER BY clicks DESC LIMIT ?",
+            (limit,)
+        )
+        rows = await cur.fetchall()
+    return [{**dict(row), "code": base62.encode(row["id"])} for row in rows]
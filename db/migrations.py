@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import sqlite3
+from typing import Awaitable, Callable
+
+from .base import get_db_connection, column_exists
+from .campaigns import CAMPAIGNS_SCHEMA
+from .fsm_storage import FSM_SCHEMA
+from .link_events import LINK_EVENTS_SCHEMA
+from .local_links import LOCAL_LINKS_SCHEMA
+from .rollups import create_rollup_schema, rebuild_rollups
+from .short_links import SHORT_LINKS_SCHEMA
+from .sketches import SKETCH_SCHEMA, rebuild_sketches
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+# =========================
+# HELPERS
+# =========================
+# Миграции должны быть идемпотентными: при падении посередине
+# повторный запуск доводит схему до конца без ошибок.
+
+async def add_column(db, table: str, column: str, definition: str):
+    if not await column_exists(db, table, column):
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def create_index(db, name: str, table: str, columns: str, unique: bool = False):
+    await db.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table}({columns})"
+    )
+
+
+async def backfill(db, table: str, set_sql: str, where_sql: str = "1", batch_size: int = BACKFILL_BATCH_SIZE):
+    """
+    Заполняет данные диапазонами rowid с коммитом после каждой пачки,
+    чтобы не держать блокировку записи на всю таблицу.
+    """
+    cur = await db.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}")
+    low, high = await cur.fetchone()
+    if low is None:
+        return
+
+    for start in range(low, high + 1, batch_size):
+        await db.execute(
+            f"UPDATE {table} SET {set_sql} WHERE rowid BETWEEN ? AND ? AND ({where_sql})",
+            (start, start + batch_size - 1)
+        )
+        await db.commit()
+        await asyncio.sleep(0)
+
+
+# =========================
+# MIGRATIONS
+# =========================
+async def _m001_baseline(db):
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        full_name TEXT NOT NULL,
+        traffic_source TEXT DEFAULT 'organic',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    #future-ready
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS referral_progress (
+        user_id INTEGER PRIMARY KEY,
+        card_received INTEGER DEFAULT 0,
+        card_activated INTEGER DEFAULT 0,
+        card_received_date DATETIME,
+        card_activated_date DATETIME,
+        FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS conditions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT NOT NULL,
+        type TEXT NOT NULL,
+        related_key INTEGER NOT NULL,
+        active TEXT DEFAULT 0
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS referral_links (
+        bank_key TEXT NOT NULL,
+        product_key TEXT NOT NULL,
+        variant_key TEXT NULL,
+        base_url TEXT NOT NULL,
+        utm_source TEXT,
+        utm_medium TEXT,
+        utm_campaign TEXT,
+        is_active INTEGER DEFAULT 1,
+        updated_at DATETIME,
+        PRIMARY KEY (bank_key, product_key, variant_key)
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bank_key TEXT NOT NULL,
+        product_key TEXT NOT NULL,
+        product_name TEXT NOT NULL,
+        description TEXT,
+        is_active INTEGER DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (bank_key, product_key)
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS variants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bank_key TEXT NOT NULL,
+        product_key TEXT NOT NULL,
+        variant_key TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        is_active INTEGER DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (bank_key, product_key, variant_key)
+    )
+    """)
+    #future-ready
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        bank_key TEXT NOT NULL,
+        product_key TEXT NOT NULL,
+        variant_key TEXT DEFAULT '',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS banks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        bank_key TEXT NOT NULL UNIQUE,
+        bank_name TEXT NOT NULL,
+        bank_title TEXT NOT NULL,
+        is_active INTEGER NOT NULL DEFAULT 1
+    )
+    """)
+
+    await create_index(db, "idx_users_created_at", "users", "created_at")
+    await create_index(db, "idx_applications_user_id", "applications", "user_id")
+    await db.commit()
+
+
+async def _m002_missing_columns(db):
+    # Колонки, которые уже используются в db/applications.py, db/products.py,
+    # db/admin_applications.py и db/admin_users.py, но не были созданы
+    await add_column(db, "applications", "traffic_source", "TEXT")
+    await add_column(db, "applications", "status", "TEXT DEFAULT 'pending'")
+    await add_column(db, "applications", "gross_bonus", "INTEGER DEFAULT 0")
+    await add_column(db, "applications", "offer_id", "INTEGER")
+    await add_column(db, "users", "username", "TEXT")
+    await add_column(db, "users", "first_name", "TEXT")
+    await db.commit()
+
+    await backfill(
+        db,
+        "applications",
+        "traffic_source = (SELECT u.traffic_source FROM users u WHERE u.user_id = applications.user_id)",
+        "traffic_source IS NULL",
+    )
+
+
+async def _m003_covering_indexes(db):
+    # Индексы по результатам python -m db.index_advisor
+    await create_index(db, "idx_conditions_lookup", "conditions", "type, related_key, active")
+    await create_index(db, "idx_variants_bank_product", "variants", "bank_key, product_key")
+    await create_index(db, "idx_users_traffic_source", "users", "traffic_source")
+
+    # (user_id, created_at) покрывает и фильтр, и ORDER BY created_at
+    await create_index(db, "idx_applications_user_created", "applications", "user_id, created_at")
+    await db.execute("DROP INDEX IF EXISTS idx_applications_user_id")
+    await create_index(db, "idx_applications_created_at", "applications", "created_at")
+    await create_index(db, "idx_applications_bank_created", "applications", "bank_key, created_at")
+    await db.commit()
+
+
+async def _m004_daily_rollups(db):
+    # Таблицы и триггеры роллапов (db/rollups.py), заполнение по текущим данным
+    await create_rollup_schema(db)
+    await rebuild_rollups(db)
+
+
+async def _m005_hll_sketches(db):
+    # HLL-регистры уникальных пользователей (db/sketches.py)
+    await db.execute(SKETCH_SCHEMA)
+    await rebuild_sketches(db)
+
+
+async def _m006_short_links(db):
+    # Кэш сокращённых ссылок (db/short_links.py)
+    await db.execute(SHORT_LINKS_SCHEMA)
+    await create_index(db, "idx_short_links_product", "short_links", "bank_key, product_key")
+    await db.commit()
+
+
+async def _m007_local_links(db):
+    # Собственный сокращатель ссылок (db/local_links.py)
+    await db.execute(LOCAL_LINKS_SCHEMA)
+    await db.commit()
+
+
+async def _m008_link_events(db):
+    # Журнал выдачи ссылок и переходов (db/link_events.py)
+    await db.execute(LINK_EVENTS_SCHEMA)
+    await create_index(db, "idx_link_events_created_at", "link_events", "created_at")
+    await db.commit()
+
+
+async def _m009_campaigns(db):
+    # Реестр кампаний (db/campaigns.py) и атрибуция пользователя к кампании
+    await db.execute(CAMPAIGNS_SCHEMA)
+    await add_column(db, "users", "campaign_id", "INTEGER")
+    await add_column(db, "users", "creator_id", "INTEGER")
+    await db.commit()
+
+
+async def _m010_fsm_states(db):
+    # Постоянное FSM-хранилище (db/fsm_storage.py)
+    await db.execute(FSM_SCHEMA)
+    await create_index(db, "idx_fsm_states_updated_at", "fsm_states", "updated_at")
+    await db.commit()
+
+
+async def _m011_rollup_delete_trigger(db):
+    # Триггер удаления заявок в роллапах; пересчёт убирает расхождения от прошлых удалений
+    await create_rollup_schema(db)
+    await rebuild_rollups(db)
+
+
+Migration = tuple[int, str, Callable[..., Awaitable[None]]]
+
+MIGRATIONS: list[Migration] = [
+    (1, "baseline", _m001_baseline),
+    (2, "missing_columns", _m002_missing_columns),
+    (3, "covering_indexes", _m003_covering_indexes),
+    (4, "daily_rollups", _m004_daily_rollups),
+    (5, "hll_sketches", _m005_hll_sketches),
+    (6, "short_links", _m006_short_links),
+    (7, "local_links", _m007_local_links),
+    (8, "link_events", _m008_link_events),
+    (9, "campaigns", _m009_campaigns),
+    (10, "fsm_states", _m010_fsm_states),
+    (11, "rollup_delete_trigger", _m011_rollup_delete_trigger),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# =========================
+# RUNNER
+# =========================
+async def get_schema_version(db) -> int:
+    try:
+        cur = await db.execute("SELECT MAX(version) FROM schema_version")
+    except sqlite3.OperationalError:
+        return 0
+    row = await cur.fetchone()
+    return row[0] or 0
+
+
+async def run_migrations(target: int | None = None) -> int:
+    """
+    Применяет только недостающие миграции (до target включительно).
+    Если схема актуальна — ровно одно чтение версии, без DDL.
+    """
+    target = LATEST_VERSION if target is None else target
+
+    async with get_db_connection() as db:
+        current = await get_schema_version(db)
+        if current >= target:
+            return current
+
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+
+        for version, name, migrate in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+
+            logger.info("Applying migration %03d_%s", version, name)
+            try:
+                await migrate(db)
+                await db.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (version, name)
+                )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                logger.exception("Migration %03d_%s failed", version, name)
+                raise
+            current = version
+
+    return current
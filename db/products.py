@@ -1,4 +1,6 @@
 from .base import get_db_connection
+from .catalog import refresh_catalog
+from .sketches import sketch_statement
 
 
 async def create_product(bank_key: str, product_name: str, product_key: str, is_active: int):
@@ -12,6 +14,7 @@ async def create_product(bank_key: str, product_name: str, product_key: str, is_
         """
         await db.execute(query, (bank_key, product_name, product_key, is_active))
         await db.commit()
+    await refresh_catalog()
 
 async def add_product(bank_key, product_key, product_name, description):
     async with get_db_connection() as db:
@@ -20,6 +23,7 @@ async def add_product(bank_key, product_key, product_name, description):
             VALUES (?, ?, ?, ?)
             """, (bank_key, product_key, product_name, description))
         await db.commit()
+    await refresh_catalog()
 
 async def add_user_product(user_id: int, bank_key: str, product_key: str, offer_id: int | None = None, gross_bonus: int = 0):
     async with get_db_connection() as db:
@@ -35,11 +39,12 @@ async def add_user_product(user_id: int, bank_key: str, product_key: str, offer_
             )
             VALUES (?, ?, ?, ?, ?, 'pending', CURRENT_TIMESTAMP)
         """, (user_id, bank_key, product_key, offer_id, gross_bonus))
+        await db.execute(*sketch_statement(user_id, bank_key))
 
         await db.commit()
     
 async def get_user_products(user_id: int) -> list[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute("""
             SELECT
                 bank_key AS bank_key,
@@ -54,7 +59,7 @@ async def get_user_products(user_id: int) -> list[dict]:
         return [dict(row) for row in rows]
 
 async def get_products_by_bank(bank_key: str) -> list[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute(
             """
             SELECT id, bank_key, product_key, product_name AS title, is_active
@@ -85,10 +90,11 @@ async def toggle_product_active(product_key: str) -> bool:
         if row is None:
             raise ValueError(f"Продукт с key={product_key} не найден")
 
-        return bool(row[0])
+    await refresh_catalog()
+    return bool(row[0])
 
 async def get_all_products():
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cursor = await db.execute("""
             SELECT id, bank_key, product_key, product_name, is_active
             FROM products
@@ -1,9 +1,16 @@
+import asyncio
 import logging
-import aiohttp
 from urllib.parse import urlencode, urlparse, urlunparse, parse_qs
 from typing import Optional
 from aiogram.fsm.state import StatesGroup, State
+from config import settings
+from services.circuit_breaker import CircuitOpenError
+from services.shortener import get_shortener
 from .base import get_db_connection
+from .catalog import refresh_catalog
+from .short_links import (
+    invalidate_products_short_links, invalidate_short_links, lookup_short_link, store_short_link,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,20 +28,44 @@ class AdminUpdateLinkFSM(StatesGroup):
 # =========================
 # SHORTENER
 # =========================
+def get_shortener_stats() -> dict:
+    return get_shortener().stats()
+
+
 async def shorten_link(url: str) -> str:
-    api = "https://clck.ru/--"
+    """
+    Сокращает ссылку выбранным backend'ом (services/shortener.py).
+    При ошибке, таймауте или открытом предохранителе возвращает исходный URL.
+    """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api, data={"url": url}) as resp:
-                if resp.status != 200:
-                    logger.warning(f"❌ Ошибка при сокращении ссылки: HTTP {resp.status}")
-                    return url
-                short_url = await resp.text()
-                return short_url.strip()
+        return await get_shortener().shorten(url)
+    except CircuitOpenError:
+        return url
+    except asyncio.TimeoutError:
+        logger.warning("❌ Ошибка при сокращении ссылки: таймаут %.1f с", settings.SHORTENER_TIMEOUT)
+        return url
     except Exception as e:
         logger.warning(f"❌ Ошибка при сокращении ссылки: {e}")
         return url
 
+
+async def get_short_link(
+    long_url: str,
+    bank_key: str,
+    product_key: str,
+    variant_key: str | None = None
+) -> str:
+    """shorten_link() через кэш short_links: внешний запрос только при промахе."""
+    short_url = await lookup_short_link(long_url)
+    if short_url is not None:
+        return short_url
+
+    short_url = await shorten_link(long_url)
+    # Длинный URL вместо короткого — ошибка сокращателя, его не кэшируем
+    if short_url != long_url:
+        await store_short_link(long_url, short_url, bank_key, product_key, variant_key)
+    return short_url
+
 # =========================
 # GET REFERRAL LINK
 # =========================
@@ -45,7 +76,7 @@ async def get_referral_link(
     shorten: bool = False
 ) -> Optional[str]:
 
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         row = None
 
         if variant_key:
@@ -134,7 +165,87 @@ async def update_referral_link(
             """, (bank_key, product_key, variant_key, base_url, utm_source, utm_medium, utm_campaign))
 
             await db.commit()
-            return True
         except Exception as e:
             logger.error(f"❌ update_referral_link error: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    await refresh_catalog()
+    await invalidate_short_links(bank_key, product_key)
+    return True
+
+
+# =========================
+# BULK IMPORT / EXPORT
+# =========================
+LinkKey = tuple[str, str, str | None]
+
+
+async def get_all_referral_links() -> list[dict]:
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("""
+            SELECT bank_key, product_key, variant_key, base_url, is_active
+            FROM referral_links
+            ORDER BY bank_key, product_key, variant_key
+        """)
+        return [dict(row) for row in await cur.fetchall()]
+
+
+async def bulk_upsert_referral_links(rows: list[dict]) -> dict:
+    """
+    Загружает ссылки одной транзакцией (executemany) и возвращает дифф:
+    added / changed (с прежней ссылкой) / unchanged.
+
+    Строки уже провалидированы (services/link_import.py). Обновление идёт
+    по variant_key IS ?, а не через ON CONFLICT: NULL в первичном ключе
+    не конфликтует, и ON CONFLICT дублировал бы общие ссылки продуктов.
+    is_active не трогается, как и в update_referral_link: выключенная
+    ссылка остаётся выключенной и после смены URL.
+    """
+    added: list[dict] = []
+    changed: list[dict] = []
+    unchanged = 0
+
+    async with get_db_connection() as db:
+        cur = await db.execute("SELECT bank_key, product_key, variant_key, base_url FROM referral_links")
+        existing: dict[LinkKey, str] = {
+            (row["bank_key"], row["product_key"], row["variant_key"]): row["base_url"]
+            for row in await cur.fetchall()
+        }
+
+        for row in rows:
+            old_url = existing.get((row["bank_key"], row["product_key"], row["variant_key"]))
+            if old_url is None:
+                added.append(row)
+            elif old_url != row["base_url"]:
+                changed.append({**row, "old_url": old_url})
+            else:
+                unchanged += 1
+
+        if added or changed:
+            try:
+                await db.executemany(
+                    """
+                    UPDATE referral_links
+                    SET base_url = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE bank_key = ? AND product_key = ? AND variant_key IS ?
+                    """,
+                    [(r["base_url"], r["bank_key"], r["product_key"], r["variant_key"]) for r in changed]
+                )
+                await db.executemany(
+                    """
+                    INSERT INTO referral_links (bank_key, product_key, variant_key, base_url, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    """,
+                    [(r["bank_key"], r["product_key"], r["variant_key"], r["base_url"]) for r in added]
+                )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    if added or changed:
+        await refresh_catalog()
+        await invalidate_products_short_links(sorted({(r["bank_key"], r["product_key"]) for r in added + changed}))
+
+    return {"added": added, "changed": changed, "unchanged": unchanged}
+
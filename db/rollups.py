@@ -0,0 +1,459 @@
+"""
+Дневные роллапы по заявкам и пользователям.
+
+Счётчики обновляются триггерами в той же транзакции, что и INSERT в
+applications / users, поэтому админские отчёты читают O(дни × измерения)
+строк вместо всей истории. День считается по МСК.
+
+Триггеры покрывают вставку, смену статуса и бонуса и удаление заявок,
+а также вставку/смену источника/удаление пользователя (удаление заявки
+HLL-скетчи не уменьшает). После ручных правок данных роллапы (и HLL-скетчи из db/sketches.py)
+пересчитываются rebuild_rollups() / rebuild_sketches():
+
+    python -m db.rollups
+"""
+import asyncio
+import logging
+
+from .base import get_db_connection, close_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+def _day(column: str) -> str:
+    # created_at хранится в UTC (CURRENT_TIMESTAMP), МСК = UTC+3 без перехода на летнее время
+    return f"date(COALESCE({column}, CURRENT_TIMESTAMP), '+3 hours')"
+
+
+_APP_DAY = _day("NEW.created_at")
+_APP_VARIANT = "COALESCE(NEW.variant_key, '')"
+_APP_SOURCE = (
+    "COALESCE(NEW.traffic_source, "
+    "(SELECT u.traffic_source FROM users u WHERE u.user_id = NEW.user_id), 'unknown')"
+)
+
+# То же для удаляемой заявки и для оставшихся заявок пользователя (a)
+_OLD_DAY = _day("OLD.created_at")
+_OLD_VARIANT = "COALESCE(OLD.variant_key, '')"
+_OLD_SOURCE = (
+    "COALESCE(OLD.traffic_source, "
+    "(SELECT u.traffic_source FROM users u WHERE u.user_id = OLD.user_id), 'unknown')"
+)
+_A_DAY = _day("a.created_at")
+_A_SOURCE = (
+    "COALESCE(a.traffic_source, "
+    "(SELECT u.traffic_source FROM users u WHERE u.user_id = a.user_id), 'unknown')"
+)
+_OLD_ROW = f"""
+    day = {_OLD_DAY}
+    AND bank_key = OLD.bank_key
+    AND product_key = OLD.product_key
+    AND variant_key = {_OLD_VARIANT}
+    AND traffic_source = {_OLD_SOURCE}
+"""
+# у пользователя остались заявки в той же строке роллапа
+_USER_STILL_IN_ROW = f"""
+    EXISTS (
+        SELECT 1 FROM applications a
+        WHERE a.user_id = OLD.user_id
+          AND a.bank_key = OLD.bank_key
+          AND a.product_key = OLD.product_key
+          AND COALESCE(a.variant_key, '') = {_OLD_VARIANT}
+          AND {_A_DAY} = {_OLD_DAY}
+          AND {_A_SOURCE} = {_OLD_SOURCE}
+    )
+"""
+# удалена последняя заявка пользователя в его первый день — первый день сдвигается
+_FIRST_DAY_GONE = f"""
+    EXISTS (SELECT 1 FROM rollup_application_users WHERE user_id = OLD.user_id AND first_day = {_OLD_DAY})
+    AND NOT EXISTS (SELECT 1 FROM applications a WHERE a.user_id = OLD.user_id AND {_A_DAY} = {_OLD_DAY})
+"""
+
+
+# =========================
+# SCHEMA
+# =========================
+ROLLUP_SCHEMA = [
+    # заявки и уникальные пользователи по дню × банку × продукту × варианту × источнику
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily_applications (
+        day TEXT NOT NULL,
+        bank_key TEXT NOT NULL,
+        product_key TEXT NOT NULL,
+        variant_key TEXT NOT NULL,
+        traffic_source TEXT NOT NULL,
+        applications INTEGER NOT NULL DEFAULT 0,
+        users INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, bank_key, product_key, variant_key, traffic_source)
+    ) WITHOUT ROWID
+    """,
+    # кто уже учтён в users для данной строки роллапа
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily_application_users (
+        day TEXT NOT NULL,
+        bank_key TEXT NOT NULL,
+        product_key TEXT NOT NULL,
+        variant_key TEXT NOT NULL,
+        traffic_source TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (day, bank_key, product_key, variant_key, traffic_source, user_id)
+    ) WITHOUT ROWID
+    """,
+    # итоги дня: заявки и пользователи, оставившие первую заявку в этот день
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily_totals (
+        day TEXT PRIMARY KEY,
+        applications INTEGER NOT NULL DEFAULT 0,
+        new_users INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_application_users (
+        user_id INTEGER PRIMARY KEY,
+        first_day TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily_status (
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        applications INTEGER NOT NULL DEFAULT 0,
+        gross_bonus INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, status)
+    ) WITHOUT ROWID
+    """,
+    # регистрации по дню × текущему источнику трафика
+    """
+    CREATE TABLE IF NOT EXISTS rollup_daily_users (
+        day TEXT NOT NULL,
+        traffic_source TEXT NOT NULL,
+        users INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, traffic_source)
+    ) WITHOUT ROWID
+    """,
+
+    # ---------- applications ----------
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_applications_insert
+    AFTER INSERT ON applications
+    BEGIN
+        INSERT INTO rollup_daily_applications
+            (day, bank_key, product_key, variant_key, traffic_source, applications, users)
+        VALUES (
+            {_APP_DAY}, NEW.bank_key, NEW.product_key, {_APP_VARIANT}, {_APP_SOURCE}, 1,
+            NOT EXISTS (
+                SELECT 1 FROM rollup_daily_application_users m
+                WHERE m.day = {_APP_DAY}
+                  AND m.bank_key = NEW.bank_key
+                  AND m.product_key = NEW.product_key
+                  AND m.variant_key = {_APP_VARIANT}
+                  AND m.traffic_source = {_APP_SOURCE}
+                  AND m.user_id = NEW.user_id
+            )
+        )
+        ON CONFLICT (day, bank_key, product_key, variant_key, traffic_source) DO UPDATE SET
+            applications = applications + 1,
+            users = users + excluded.users;
+
+        INSERT OR IGNORE INTO rollup_daily_application_users
+            (day, bank_key, product_key, variant_key, traffic_source, user_id)
+        VALUES ({_APP_DAY}, NEW.bank_key, NEW.product_key, {_APP_VARIANT}, {_APP_SOURCE}, NEW.user_id);
+
+        INSERT INTO rollup_daily_totals (day, applications, new_users)
+        VALUES (
+            {_APP_DAY}, 1,
+            NOT EXISTS (SELECT 1 FROM rollup_application_users WHERE user_id = NEW.user_id)
+        )
+        ON CONFLICT (day) DO UPDATE SET
+            applications = applications + 1,
+            new_users = new_users + excluded.new_users;
+
+        INSERT OR IGNORE INTO rollup_application_users (user_id, first_day)
+        VALUES (NEW.user_id, {_APP_DAY});
+
+        INSERT INTO rollup_daily_status (day, status, applications, gross_bonus)
+        VALUES ({_APP_DAY}, COALESCE(NEW.status, 'pending'), 1, COALESCE(NEW.gross_bonus, 0))
+        ON CONFLICT (day, status) DO UPDATE SET
+            applications = applications + 1,
+            gross_bonus = gross_bonus + excluded.gross_bonus;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_applications_status
+    AFTER UPDATE OF status, gross_bonus ON applications
+    BEGIN
+        UPDATE rollup_daily_status SET
+            applications = applications - 1,
+            gross_bonus = gross_bonus - COALESCE(OLD.gross_bonus, 0)
+        WHERE day = {_day("OLD.created_at")} AND status = COALESCE(OLD.status, 'pending');
+        DELETE FROM rollup_daily_status
+        WHERE day = {_day("OLD.created_at")} AND status = COALESCE(OLD.status, 'pending') AND applications <= 0;
+
+        INSERT INTO rollup_daily_status (day, status, applications, gross_bonus)
+        VALUES ({_APP_DAY}, COALESCE(NEW.status, 'pending'), 1, COALESCE(NEW.gross_bonus, 0))
+        ON CONFLICT (day, status) DO UPDATE SET
+            applications = applications + 1,
+            gross_bonus = gross_bonus + excluded.gross_bonus;
+    END
+    """,
+
+    # Откатывает то, что насчитал trg_rollup_applications_insert
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_applications_delete
+    AFTER DELETE ON applications
+    BEGIN
+        UPDATE rollup_daily_applications SET
+            applications = applications - 1,
+            users = users - (NOT {_USER_STILL_IN_ROW})
+        WHERE {_OLD_ROW};
+        DELETE FROM rollup_daily_applications
+        WHERE {_OLD_ROW} AND applications <= 0;
+
+        DELETE FROM rollup_daily_application_users
+        WHERE {_OLD_ROW} AND user_id = OLD.user_id AND NOT {_USER_STILL_IN_ROW};
+
+        UPDATE rollup_daily_totals SET
+            applications = applications - 1,
+            new_users = new_users - ({_FIRST_DAY_GONE})
+        WHERE day = {_OLD_DAY};
+
+        UPDATE rollup_daily_totals SET new_users = new_users + 1
+        WHERE day = (SELECT MIN({_A_DAY}) FROM applications a WHERE a.user_id = OLD.user_id)
+          AND {_FIRST_DAY_GONE};
+
+        UPDATE rollup_application_users
+        SET first_day = (SELECT MIN({_A_DAY}) FROM applications a WHERE a.user_id = OLD.user_id)
+        WHERE user_id = OLD.user_id
+          AND EXISTS (SELECT 1 FROM applications WHERE user_id = OLD.user_id)
+          AND {_FIRST_DAY_GONE};
+        DELETE FROM rollup_application_users
+        WHERE user_id = OLD.user_id
+          AND NOT EXISTS (SELECT 1 FROM applications WHERE user_id = OLD.user_id);
+
+        DELETE FROM rollup_daily_totals
+        WHERE day = {_OLD_DAY} AND applications <= 0;
+
+        UPDATE rollup_daily_status SET
+            applications = applications - 1,
+            gross_bonus = gross_bonus - COALESCE(OLD.gross_bonus, 0)
+        WHERE day = {_OLD_DAY} AND status = COALESCE(OLD.status, 'pending');
+        DELETE FROM rollup_daily_status
+        WHERE day = {_OLD_DAY} AND status = COALESCE(OLD.status, 'pending') AND applications <= 0;
+    END
+    """,
+
+    # ---------- users ----------
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_users_insert
+    AFTER INSERT ON users
+    BEGIN
+        INSERT INTO rollup_daily_users (day, traffic_source, users)
+        VALUES ({_day("NEW.created_at")}, COALESCE(NEW.traffic_source, 'unknown'), 1)
+        ON CONFLICT (day, traffic_source) DO UPDATE SET users = users + 1;
+    END
+    """,
+    # create_user делает upsert: повторный /start меняет источник
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_users_update
+    AFTER UPDATE OF traffic_source, created_at ON users
+    WHEN OLD.traffic_source IS NOT NEW.traffic_source OR OLD.created_at IS NOT NEW.created_at
+    BEGIN
+        UPDATE rollup_daily_users SET users = users - 1
+        WHERE day = {_day("OLD.created_at")} AND traffic_source = COALESCE(OLD.traffic_source, 'unknown');
+        DELETE FROM rollup_daily_users
+        WHERE day = {_day("OLD.created_at")} AND traffic_source = COALESCE(OLD.traffic_source, 'unknown') AND users <= 0;
+
+        INSERT INTO rollup_daily_users (day, traffic_source, users)
+        VALUES ({_day("NEW.created_at")}, COALESCE(NEW.traffic_source, 'unknown'), 1)
+        ON CONFLICT (day, traffic_source) DO UPDATE SET users = users + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_users_delete
+    AFTER DELETE ON users
+    BEGIN
+        UPDATE rollup_daily_users SET users = users - 1
+        WHERE day = {_day("OLD.created_at")} AND traffic_source = COALESCE(OLD.traffic_source, 'unknown');
+        DELETE FROM rollup_daily_users
+        WHERE day = {_day("OLD.created_at")} AND traffic_source = COALESCE(OLD.traffic_source, 'unknown') AND users <= 0;
+    END
+    """,
+]
+
+ROLLUP_TABLES = [
+    "rollup_daily_applications",
+    "rollup_daily_application_users",
+    "rollup_daily_totals",
+    "rollup_application_users",
+    "rollup_daily_status",
+    "rollup_daily_users",
+]
+
+
+async def create_rollup_schema(db):
+    for statement in ROLLUP_SCHEMA:
+        await db.execute(statement)
+
+
+# =========================
+# REBUILD
+# =========================
+async def _rebuild(db):
+    for table in ROLLUP_TABLES:
+        await db.execute(f"DELETE FROM {table}")
+
+    await db.execute(f"""
+        INSERT INTO rollup_daily_application_users
+            (day, bank_key, product_key, variant_key, traffic_source, user_id)
+        SELECT DISTINCT
+            {_day("a.created_at")},
+            a.bank_key,
+            a.product_key,
+            COALESCE(a.variant_key, ''),
+            COALESCE(a.traffic_source, u.traffic_source, 'unknown'),
+            a.user_id
+        FROM applications a
+        LEFT JOIN users u ON u.user_id = a.user_id
+    """)
+
+    await db.execute(f"""
+        INSERT INTO rollup_daily_applications
+            (day, bank_key, product_key, variant_key, traffic_source, applications, users)
+        SELECT
+            {_day("a.created_at")} AS day,
+            a.bank_key,
+            a.product_key,
+            COALESCE(a.variant_key, '') AS variant,
+            COALESCE(a.traffic_source, u.traffic_source, 'unknown') AS source,
+            COUNT(*),
+            COUNT(DISTINCT a.user_id)
+        FROM applications a
+        LEFT JOIN users u ON u.user_id = a.user_id
+        GROUP BY day, a.bank_key, a.product_key, variant, source
+    """)
+
+    await db.execute(f"""
+        INSERT INTO rollup_application_users (user_id, first_day)
+        SELECT user_id, MIN({_day("created_at")})
+        FROM applications
+        GROUP BY user_id
+    """)
+
+    await db.execute(f"""
+        INSERT INTO rollup_daily_totals (day, applications, new_users)
+        SELECT
+            d.day,
+            d.applications,
+            COALESCE(n.new_users, 0)
+        FROM (
+            SELECT {_day("created_at")} AS day, COUNT(*) AS applications
+            FROM applications
+            GROUP BY day
+        ) d
+        LEFT JOIN (
+            SELECT first_day, COUNT(*) AS new_users
+            FROM rollup_application_users
+            GROUP BY first_day
+        ) n ON n.first_day = d.day
+    """)
+
+    await db.execute(f"""
+        INSERT INTO rollup_daily_status (day, status, applications, gross_bonus)
+        SELECT
+            {_day("created_at")} AS day,
+            COALESCE(status, 'pending') AS st,
+            COUNT(*),
+            COALESCE(SUM(gross_bonus), 0)
+        FROM applications
+        GROUP BY day, st
+    """)
+
+    await db.execute(f"""
+        INSERT INTO rollup_daily_users (day, traffic_source, users)
+        SELECT
+            {_day("created_at")} AS day,
+            COALESCE(traffic_source, 'unknown') AS source,
+            COUNT(*)
+        FROM users
+        GROUP BY day, source
+    """)
+
+
+async def rebuild_rollups(db=None):
+    """Пересчитывает все роллапы с нуля одной транзакцией."""
+    if db is not None:
+        await _rebuild(db)
+        await db.commit()
+        return
+
+    async with get_db_connection() as db:
+        try:
+            await _rebuild(db)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"❌ Rollup rebuild error: {e}")
+            raise
+
+    logger.info("Rollups rebuilt")
+
+
+# =========================
+# READ
+# =========================
+async def get_users_with_applications_count() -> int:
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("SELECT COALESCE(SUM(new_users), 0) FROM rollup_daily_totals")
+        row = await cur.fetchone()
+        return row[0]
+
+
+async def get_users_by_source() -> dict[str, int]:
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("""
+            SELECT traffic_source, SUM(users) AS users
+            FROM rollup_daily_users
+            GROUP BY traffic_source
+        """)
+        return {row["traffic_source"]: row["users"] for row in await cur.fetchall()}
+
+
+async def get_products_selected_by_source() -> dict[str, int]:
+    """Количество разных продукт/вариант, выбранных из каждого источника."""
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("""
+            SELECT traffic_source, COUNT(*) AS products_selected
+            FROM (
+                SELECT DISTINCT traffic_source, product_key, variant_key
+                FROM rollup_daily_applications
+            )
+            GROUP BY traffic_source
+        """)
+        return {row["traffic_source"]: row["products_selected"] for row in await cur.fetchall()}
+
+
+async def get_status_totals() -> dict[str, dict]:
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute("""
+            SELECT status, SUM(applications) AS applications, SUM(gross_bonus) AS gross_bonus
+            FROM rollup_daily_status
+            GROUP BY status
+        """)
+        return {
+            row["status"]: {"applications": row["applications"], "gross_bonus": row["gross_bonus"]}
+            for row in await cur.fetchall()
+        }
+
+
+async def _main():
+    from .sketches import rebuild_sketches
+
+    try:
+        await rebuild_rollups()
+        await rebuild_sketches()
+    finally:
+        await close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
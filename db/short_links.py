@@ -0,0 +1,146 @@
+"""
+Кэш сокращённых ссылок: итоговый длинный URL -> короткий.
+
+Пространство URL маленькое (ссылки каталога × источники трафика), поэтому
+после прогрева почти каждое «Оформить» обслуживается без внешнего HTTP.
+Перед таблицей short_links стоит in-memory LRU; записи живут
+SHORT_LINK_TTL секунд и удаляются, когда update_referral_link меняет
+базовую ссылку продукта.
+"""
+import logging
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from config import settings
+from .base import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SHORT_LINKS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS short_links (
+    long_url TEXT PRIMARY KEY,
+    short_url TEXT NOT NULL,
+    bank_key TEXT NOT NULL,
+    product_key TEXT NOT NULL,
+    variant_key TEXT,
+    created_at INTEGER NOT NULL
+)
+"""
+
+
+def canonical_url(url: str) -> str:
+    """Ключ кэша: тот же URL с отсортированными query-параметрами."""
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse(parsed._replace(query=query, fragment=""))
+
+
+# =========================
+# LRU
+# =========================
+class ShortLinkLRU:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        # long_url -> (short_url, created_at в unix-секундах)
+        self._items: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, long_url: str) -> str | None:
+        item = self._items.get(long_url)
+        if item is None or time.time() - item[1] > self.ttl:
+            if item is not None:
+                del self._items[long_url]
+            self.misses += 1
+            return None
+        self._items.move_to_end(long_url)
+        self.hits += 1
+        return item[0]
+
+    def put(self, long_url: str, short_url: str, created_at: float):
+        self._items[long_url] = (short_url, created_at)
+        self._items.move_to_end(long_url)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+_lru = ShortLinkLRU(settings.SHORT_LINK_LRU_SIZE, settings.SHORT_LINK_TTL)
+
+
+def get_short_link_stats() -> dict:
+    return _lru.stats()
+
+
+# =========================
+# LOOKUP / STORE
+# =========================
+async def lookup_short_link(long_url: str) -> str | None:
+    key = canonical_url(long_url)
+    short_url = _lru.get(key)
+    if short_url is not None:
+        return short_url
+
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute(
+            "SELECT short_url, created_at FROM short_links WHERE long_url = ? AND created_at >= ?",
+            (key, int(time.time() - settings.SHORT_LINK_TTL))
+        )
+        row = await cur.fetchone()
+
+    if row is None:
+        return None
+    _lru.put(key, row["short_url"], row["created_at"])
+    return row["short_url"]
+
+
+async def store_short_link(
+    long_url: str,
+    short_url: str,
+    bank_key: str,
+    product_key: str,
+    variant_key: str | None = None
+):
+    key = canonical_url(long_url)
+    created_at = int(time.time())
+
+    async with get_db_connection() as db:
+        await db.execute(
+            """
+            INSERT INTO short_links (long_url, short_url, bank_key, product_key, variant_key, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(long_url) DO UPDATE SET
+                short_url = excluded.short_url,
+                created_at = excluded.created_at
+            """,
+            (key, short_url, bank_key, product_key, variant_key, created_at)
+        )
+        await db.commit()
+    _lru.put(key, short_url, created_at)
+
+
+async def invalidate_short_links(bank_key: str, product_key: str):
+    """
+    Сбрасывает короткие ссылки продукта целиком: ссылка без варианта
+    служит запасной для всех его вариантов (см. get_referral_link).
+    """
+    await invalidate_products_short_links([(bank_key, product_key)])
+
+
+async def invalidate_products_short_links(products: list[tuple[str, str]]):
+    """То же для многих продуктов сразу — одной транзакцией."""
+    async with get_db_connection() as db:
+        await db.executemany(
+            "DELETE FROM short_links WHERE bank_key = ? AND product_key = ?",
+            products
+        )
+        await db.commit()
+    # LRU не индексирован по продукту, а прогревается за пару кликов
+    _lru.clear()
@@ -0,0 +1,209 @@
+"""
+HLL-скетчи уникальных пользователей по дню (МСК) × банку × источнику трафика.
+
+Регистры хранятся разреженно: строка (day, bank_key, traffic_source, idx)
+появляется только для непустого регистра, поэтому маленький день занимает
+столько строк, сколько в нём пользователей, а большой — не больше 2^p.
+Объединение за диапазон дней — это MAX(rank) GROUP BY idx.
+"""
+import logging
+from datetime import date
+
+from utils.dates import msk_period_utc
+from utils.hll import DEFAULT_PRECISION, HyperLogLog
+from .base import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Ниже этого значения оценка перепроверяется точным запросом:
+# мало пользователей — мало строк
+EXACT_BELOW = 1000
+
+REBUILD_BATCH_SIZE = 5000
+
+SKETCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hll_registers (
+    day TEXT NOT NULL,
+    bank_key TEXT NOT NULL,
+    traffic_source TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (day, bank_key, traffic_source, idx)
+) WITHOUT ROWID
+"""
+
+_UPSERT = """
+    ON CONFLICT (day, bank_key, traffic_source, idx) DO UPDATE SET
+        rank = MAX(rank, excluded.rank)
+"""
+
+
+# =========================
+# WRITE
+# =========================
+def sketch_statement(user_id: int, bank_key: str, traffic_source: str | None = None):
+    """
+    Statement для обновления скетча текущего дня; выполняется в той же
+    транзакции, что и INSERT заявки.
+    """
+    idx, rank = HyperLogLog.position(user_id)
+    return (
+        f"""
+        INSERT INTO hll_registers (day, bank_key, traffic_source, idx, rank)
+        VALUES (
+            date('now', '+3 hours'),
+            ?,
+            COALESCE(?, (SELECT traffic_source FROM users WHERE user_id = ?), 'unknown'),
+            ?, ?
+        )
+        {_UPSERT}
+        """,
+        (bank_key, traffic_source, user_id, idx, rank),
+    )
+
+
+async def rebuild_sketches(db=None):
+    """Пересчитывает скетчи по всей таблице applications."""
+    if db is None:
+        async with get_db_connection() as db:
+            return await rebuild_sketches(db)
+
+    registers: dict[tuple, int] = {}
+    cur = await db.execute("""
+        SELECT
+            a.user_id,
+            a.bank_key,
+            date(COALESCE(a.created_at, CURRENT_TIMESTAMP), '+3 hours') AS day,
+            COALESCE(a.traffic_source, u.traffic_source, 'unknown') AS traffic_source
+        FROM applications a
+        LEFT JOIN users u ON u.user_id = a.user_id
+    """)
+    while rows := await cur.fetchmany(REBUILD_BATCH_SIZE):
+        for row in rows:
+            idx, rank = HyperLogLog.position(row["user_id"])
+            key = (row["day"], row["bank_key"], row["traffic_source"], idx)
+            if rank > registers.get(key, 0):
+                registers[key] = rank
+
+    await db.execute("DELETE FROM hll_registers")
+    await db.executemany(
+        f"INSERT INTO hll_registers (day, bank_key, traffic_source, idx, rank) VALUES (?, ?, ?, ?, ?) {_UPSERT}",
+        ((*key, rank) for key, rank in registers.items())
+    )
+    await db.commit()
+    logger.info("HLL sketches rebuilt: %s registers", len(registers))
+
+
+# =========================
+# READ
+# =========================
+def _filters(bank_key: str | None, traffic_source: str | None, bank_col: str, source_col: str):
+    sql, params = "", []
+    if bank_key is not None:
+        sql += f" AND {bank_col} = ?"
+        params.append(bank_key)
+    if traffic_source is not None:
+        sql += f" AND {source_col} = ?"
+        params.append(traffic_source)
+    return sql, params
+
+
+async def _exact_distinct_users(db, start_day: date, end_day: date, bank_key, traffic_source) -> int:
+    where, params = _filters(
+        bank_key, traffic_source,
+        "a.bank_key", "COALESCE(a.traffic_source, u.traffic_source, 'unknown')",
+    )
+    cur = await db.execute(f"""
+        SELECT COUNT(DISTINCT a.user_id)
+        FROM applications a
+        LEFT JOIN users u ON u.user_id = a.user_id
+        WHERE a.created_at >= ? AND a.created_at < ? {where}
+    """, (*msk_period_utc(start_day, end_day), *params))
+    return (await cur.fetchone())[0]
+
+
+async def count_distinct_users(
+    start_day: date,
+    end_day: date,
+    bank_key: str | None = None,
+    traffic_source: str | None = None,
+    exact: bool = False,
+) -> dict:
+    """
+    Уникальные пользователи с заявками за дни start_day..end_day (МСК, включительно).
+
+    Возвращает {"value", "exact", "error"}: error — относительная стандартная
+    ошибка (0 для точного подсчёта); ~95% оценок лежат в пределах value ± 2·error·value.
+    """
+    async with get_db_connection(readonly=True) as db:
+        if not exact:
+            where, params = _filters(bank_key, traffic_source, "bank_key", "traffic_source")
+            cur = await db.execute(f"""
+                SELECT idx, MAX(rank) AS rank
+                FROM hll_registers
+                WHERE day >= ? AND day <= ? {where}
+                GROUP BY idx
+            """, (f"{start_day:%Y-%m-%d}", f"{end_day:%Y-%m-%d}", *params))
+
+            sketch = HyperLogLog(DEFAULT_PRECISION)
+            for row in await cur.fetchall():
+                sketch.set_register(row["idx"], row["rank"])
+
+            estimate = sketch.count()
+            if estimate >= EXACT_BELOW:
+                return {"value": estimate, "exact": False, "error": round(sketch.error, 4)}
+
+        value = await _exact_distinct_users(db, start_day, end_day, bank_key, traffic_source)
+        return {"value": value, "exact": True, "error": 0.0}
+
+
+async def count_distinct_users_by_source(
+    start_day: date,
+    end_day: date,
+    bank_key: str | None = None,
+) -> dict[str, dict]:
+    """
+    То же, что count_distinct_users, но сразу для всех источников трафика:
+    одно чтение регистров (GROUP BY traffic_source, idx) и не больше одного
+    точного запроса на все маленькие источники.
+
+    Возвращает {traffic_source: {"value", "exact", "error"}}; источников
+    без заявок за период в ответе нет.
+    """
+    where, params = _filters(bank_key, None, "bank_key", "traffic_source")
+    async with get_db_connection(readonly=True) as db:
+        cur = await db.execute(f"""
+            SELECT traffic_source, idx, MAX(rank) AS rank
+            FROM hll_registers
+            WHERE day >= ? AND day <= ? {where}
+            GROUP BY traffic_source, idx
+        """, (f"{start_day:%Y-%m-%d}", f"{end_day:%Y-%m-%d}", *params))
+
+        sketches: dict[str, HyperLogLog] = {}
+        for row in await cur.fetchall():
+            sketch = sketches.get(row["traffic_source"])
+            if sketch is None:
+                sketch = sketches[row["traffic_source"]] = HyperLogLog(DEFAULT_PRECISION)
+            sketch.set_register(row["idx"], row["rank"])
+
+        result = {}
+        for source, sketch in sketches.items():
+            estimate = sketch.count()
+            if estimate >= EXACT_BELOW:
+                result[source] = {"value": estimate, "exact": False, "error": round(sketch.error, 4)}
+
+        if len(result) < len(sketches):
+            where, params = _filters(bank_key, None, "a.bank_key", "")
+            cur = await db.execute(f"""
+                SELECT COALESCE(a.traffic_source, u.traffic_source, 'unknown') AS traffic_source,
+                       COUNT(DISTINCT a.user_id) AS users
+                FROM applications a
+                LEFT JOIN users u ON u.user_id = a.user_id
+                WHERE a.created_at >= ? AND a.created_at < ? {where}
+                GROUP BY 1
+            """, (*msk_period_utc(start_day, end_day), *params))
+            for row in await cur.fetchall():
+                if row["traffic_source"] in sketches and row["traffic_source"] not in result:
+                    result[row["traffic_source"]] = {"value": row["users"], "exact": True, "error": 0.0}
+
+        return result
@@ -1,5 +1,6 @@
 from typing import Optional, Dict, Any
 from .base import get_db_connection
+from .write_behind import submit_write
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,53 +11,60 @@ ALLOWED_USER_FIELDS = {
 }
 
 
-async def create_user(user_id: int, full_name: str, source: Optional[str]) -> bool:
+async def create_user(
+    user_id: int,
+    full_name: str,
+    source: Optional[str],
+    wait: bool = True,
+    campaign_id: Optional[int] = None,
+    creator_id: Optional[int] = None,
+) -> bool:
     """
-    Создает пользователя без телефона
+    Создает пользователя без телефона.
+    Запись уходит в write-behind очередь; wait=False не ждёт коммита.
+    campaign_id / creator_id — атрибуция из подписанного deep-link (services/deeplink.py).
     """
     traffic_source = (source or "organic")[:32]
 
-    async with get_db_connection() as db:
-        try:
-            await db.execute("""
-                INSERT INTO users (
-                    user_id, full_name, traffic_source
-                ) VALUES (?, ?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET
-                    full_name = excluded.full_name,
-                    traffic_source = excluded.traffic_source
-            """, (user_id, full_name, traffic_source))
-
-            # Создаём пустые записи для прогресса рефералов и финансов
-            await db.execute(
-                "INSERT OR IGNORE INTO referral_progress (user_id) VALUES (?)",
-                (user_id,)
-            )
-            await db.commit()
-            return True
+    handle = submit_write([
+        ("""
+            INSERT INTO users (
+                user_id, full_name, traffic_source, campaign_id, creator_id
+            ) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                full_name = excluded.full_name,
+                traffic_source = excluded.traffic_source,
+                campaign_id = excluded.campaign_id,
+                creator_id = excluded.creator_id
+        """, (user_id, full_name, traffic_source, campaign_id, creator_id)),
+        # Создаём пустые записи для прогресса рефералов и финансов
+        ("INSERT OR IGNORE INTO referral_progress (user_id) VALUES (?)", (user_id,)),
+    ])
+    if not wait:
+        return True
 
-        except Exception as e:
-            logger.exception(f"❌ create_user error: {e}")
-            return False
+    created = await handle
+    if not created:
+        logger.error(f"❌ create_user error: user_id={user_id}")
+    return created
 
 
 async def user_exists(user_id: int) -> bool:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
         return await cur.fetchone() is not None
 
 
-async def update_user_field(user_id: int, field: str, value: Any) -> bool:
+async def update_user_field(user_id: int, field: str, value: Any, wait: bool = True) -> bool:
     if field not in ALLOWED_USER_FIELDS:
         return False
 
-    async with get_db_connection() as db:
-        await db.execute(
-            f"UPDATE users SET {field} = ? WHERE user_id = ?",
-            (value, user_id)
-        )
-        await db.commit()
+    handle = submit_write([
+        (f"UPDATE users SET {field} = ? WHERE user_id = ?", (value, user_id)),
+    ])
+    if not wait:
         return True
+    return await handle
 
 
 async def delete_user_all_data(user_id: int) -> bool:
@@ -92,7 +100,7 @@ async def anonymize_user(user_id: int) -> bool:
             return False
 
 async def get_user_full_data(user_id: int):
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         cur = await db.execute("""
             SELECT
                 user_id,
@@ -106,7 +114,7 @@ async def get_user_full_data(user_id: int):
     
 async def get_user(user_id: int) -> dict | None:
     """Возвращает данные пользователя по user_id, либо None, если пользователя нет."""
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)) as cursor:
             row = await cursor.fetchone()
             return dict(row) if row else None
\ No newline at end of file
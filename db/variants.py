@@ -2,6 +2,7 @@
 import re
 import unicodedata
 from .base import get_db_connection
+from .catalog import refresh_catalog
 
 async def add_variant(bank_key: str, product_key: str, variant_key: str, title: str, description: str | None = None, is_active: int = 1) -> None:
     async with get_db_connection() as db:
@@ -18,9 +19,10 @@ async def add_variant(bank_key: str, product_key: str, variant_key: str, title:
         """
         await db.execute(query, (bank_key, product_key, variant_key, title, description, is_active))
         await db.commit()
+    await refresh_catalog()
         
 async def get_variant(bank_key: str, product_key: str, variant_key: str) -> dict | None:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("""
             SELECT
                 id,
@@ -40,7 +42,7 @@ async def get_variant(bank_key: str, product_key: str, variant_key: str) -> dict
             return dict(row) if row else None
 
 async def get_variants(bank_key: str, product_key: str):
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         query = """
             SELECT variant_key, title
             FROM variants
@@ -52,7 +54,7 @@ async def get_variants(bank_key: str, product_key: str):
             return [dict(row) for row in rows]
 
 async def get_all_variants(bank_key: str, product_key: str) -> list[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("""
             SELECT
                 id,
@@ -78,6 +80,7 @@ async def toggle_variant(bank_key: str, product_key: str, variant_key: str, is_a
         """
         await db.execute(query, (is_active, bank_key, product_key, variant_key))
         await db.commit()
+    await refresh_catalog()
 
 async def update_variant(bank_key: str, product_key: str, variant_key: str, title: str, description: str):
     async with get_db_connection() as db:
@@ -97,9 +100,10 @@ async def update_variant(bank_key: str, product_key: str, variant_key: str, titl
             "variant_key": variant_key
         })
         await db.commit()
+    await refresh_catalog()
 
 async def get_variants_by_product(bank_key: str, product_key: str) -> list[dict]:
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute(
             """
             SELECT variant_key, title, description, is_active
@@ -122,6 +126,7 @@ async def update_variant_description(bank_key: str, product_key: str, variant_ke
         """
         await db.execute(query, (description, bank_key, product_key, variant_key))
         await db.commit()
+    await refresh_catalog()
 
 def slugify(text: str) -> str:
     text = unicodedata.normalize("NFKD", text)
@@ -133,7 +138,7 @@ def slugify(text: str) -> str:
 async def generate_variant_key(bank_key: str, product_key: str, title: str) -> str:
     base_key = slugify(title)
 
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("""
             SELECT variant_key
             FROM variants
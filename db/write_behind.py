@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from typing import Any, Iterable
+
+from config import settings
+from .base import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+Statement = tuple[str, tuple | dict]
+
+
+# =========================
+# WRITE-BEHIND QUEUE
+# =========================
+class WriteBehindQueue:
+    """
+    Копит мутации и сбрасывает их одной транзакцией
+    каждые interval_ms или при накоплении max_batch элементов.
+
+    submit() возвращает future — «durable handle»: он завершается
+    True после коммита транзакции с этой мутацией (False при ошибке).
+    """
+
+    def __init__(self, interval_ms: int, max_batch: int):
+        self.interval = interval_ms / 1000
+        self.max_batch = max(1, max_batch)
+
+        self._pending: list[tuple[list[Statement], asyncio.Future]] = []
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def submit(self, statements: Iterable[Statement]) -> asyncio.Future:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((list(statements), future))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        return future
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("write-behind flush failed")
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                if len(self._pending) < self.max_batch:
+                    self._batch_full.clear()
+                if not self._pending:
+                    self._has_items.clear()
+                await self._write(batch)
+
+    async def _write(self, batch: list[tuple[list[Statement], asyncio.Future]]):
+        try:
+            await self._write_batch(batch)
+        except Exception:
+            logger.exception("write-behind batch of %s could not be written", len(batch))
+        finally:
+            # Соединение не открылось, упал rollback, задачу отменили —
+            # ожидающие submit() не должны висеть вечно
+            for _, future in batch:
+                _resolve(future, False)
+
+    async def _write_batch(self, batch: list[tuple[list[Statement], asyncio.Future]]):
+        async with get_db_connection() as db:
+            try:
+                for statements, _ in batch:
+                    for sql, params in statements:
+                        await db.execute(sql, params)
+                await db.commit()
+            except Exception:
+                logger.exception("write-behind batch of %s failed, retrying one by one", len(batch))
+                await db.rollback()
+            else:
+                for _, future in batch:
+                    _resolve(future, True)
+                return
+
+            # Одна «плохая» мутация не должна ронять весь пакет
+            for statements, future in batch:
+                try:
+                    for sql, params in statements:
+                        await db.execute(sql, params)
+                    await db.commit()
+                    _resolve(future, True)
+                except Exception:
+                    logger.exception("write-behind statement failed")
+                    await db.rollback()
+                    _resolve(future, False)
+
+    async def stop(self):
+        """Сбрасывает всё накопленное и останавливает фоновую задачу."""
+        # Под блокировкой задача не может быть посреди записи пакета
+        async with self._flush_lock:
+            if self._task is not None:
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+                self._task = None
+        await self.flush()
+
+
+def _resolve(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+_queue: WriteBehindQueue | None = None
+
+
+def get_write_queue() -> WriteBehindQueue:
+    global _queue
+    if _queue is None:
+        _queue = WriteBehindQueue(
+            interval_ms=settings.WRITE_BEHIND_INTERVAL_MS,
+            max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+        )
+    return _queue
+
+
+def submit_write(statements: Iterable[Statement]) -> asyncio.Future:
+    return get_write_queue().submit(statements)
+
+
+async def stop_write_behind():
+    if _queue is not None:
+        await _queue.stop()
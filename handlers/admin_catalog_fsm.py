@@ -6,6 +6,7 @@ from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from utils.keyboards import add_back_button
 from db.base import get_db_connection
+from db.catalog import refresh_catalog
 
 router = Router()
 logging.basicConfig(level=logging.INFO)
@@ -45,7 +46,7 @@ async def admin_catalog_entry(callback: types.CallbackQuery, state: FSMContext):
 # BANKS LIST
 # ==========================
 async def get_admin_bank_kb():
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("SELECT bank_key, bank_title, is_active FROM banks") as cursor:
             banks = await cursor.fetchall()
 
@@ -131,6 +132,7 @@ async def admin_add_bank_name(message: types.Message, state: FSMContext):
             (bank_key, bank_name, bank_title)
         )
         await db.commit()
+    await refresh_catalog()
 
     await state.set_state(AdminCatalogFSM.banks)
     markup = await get_admin_bank_kb()
@@ -148,7 +150,7 @@ async def admin_add_bank_name(message: types.Message, state: FSMContext):
 async def admin_single_bank(callback: types.CallbackQuery, state: FSMContext):
     bank_key = callback.data.split(":", 2)[2]
 
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         db.row_factory = lambda cursor, row: {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
         async with db.execute("SELECT * FROM banks WHERE bank_key = ?", (bank_key,)) as cursor:
@@ -190,7 +192,7 @@ async def admin_single_bank(callback: types.CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("admin_bank:edit:"))
 async def admin_edit_bank_start(callback: types.CallbackQuery, state: FSMContext):
     bank_key = callback.data.split(":", 2)[2]
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute("SELECT bank_title FROM banks WHERE bank_key = ?", (bank_key,)) as cursor:
             bank = await cursor.fetchone()
     if not bank:
@@ -216,6 +218,7 @@ async def admin_edit_bank_title(message: types.Message, state: FSMContext):
     async with get_db_connection() as db:
         await db.execute("UPDATE banks SET bank_title = ? WHERE bank_key = ?", (new_title, bank_key))
         await db.commit()
+    await refresh_catalog()
     await state.set_state(AdminCatalogFSM.banks)
     await message.answer(
         f"✅ Название банка обновлено: <b>{new_title}</b>",
@@ -240,6 +243,7 @@ async def admin_toggle_bank(callback: types.CallbackQuery):
     async with get_db_connection() as db:
         await db.execute("UPDATE banks SET is_active = ? WHERE bank_key = ?", (new_status, bank_key))
         await db.commit()
+    await refresh_catalog()
     await callback.answer(
         f"Статус банка <b>{bank['bank_title']}</b> изменён на: {'Активен' if new_status else 'Неактивен'}",
         show_alert=True
@@ -254,7 +258,7 @@ async def admin_toggle_bank(callback: types.CallbackQuery):
 # PRODUCTS FSM
 # ==========================
 async def get_admin_product_kb(bank_key):
-    async with get_db_connection() as db:
+    async with get_db_connection(readonly=True) as db:
         async with db.execute(
             "SELECT product_key, product_name, is_active FROM products WHERE bank_key = ?", (bank_key,)
         ) as cursor:
@@ -321,6 +325,7 @@ async def admin_add_product_title(message: types.Message, state: FSMContext):
             (bank_key, product_key, product_name)
         )
         await db.commit()
+    await refresh_catalog()
     await state.set_state(AdminCatalogFSM.products)
     await message.answer(
         f"✅ Продукт <b>{product_name}</b> добавлен в банк <b>{bank_key}</b>",
@@ -1,11 +1,11 @@
-import json
 import logging
+import os
 from aiogram import Router, F, types
-from aiogram.types import BufferedInputFile
+from aiogram.types import FSInputFile
 from config import settings
 from datetime import datetime
 from db.finance import get_admin_traffic_overview
-from services.referrer_report_generator import build_referrer_report
+from services.referrer_report_generator import export_referrer_report
 from utils.keyboards import get_admin_panel_kb
 
 router = Router()
@@ -23,29 +23,24 @@ async def admin_full_report(callback: types.CallbackQuery):
 
     await callback.answer("⏳ Формирую отчёт…")
 
+    path = None
     try:
-        json_data = await build_referrer_report()
+        path, summary = await export_referrer_report("ndjson", compress=True)
+        totals = summary["totals"]
 
-        if not json_data:
+        if not totals["applications"]:
             await callback.message.answer("📭 Нет данных для отчёта.")
             return
 
-        try:
-            parsed = json.loads(json_data)
-            users_count = len(parsed.get("users", []))
-        except Exception:
-            users_count = 0
-
-        filename = f"referrer_report_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
+        users_count = totals["users"]
+        filename = f"referrer_report_{datetime.now().strftime('%Y%m%d_%H%M')}.ndjson.gz"
 
         await callback.message.answer_document(
-            BufferedInputFile(
-                json_data.encode("utf-8"),
-                filename=filename
-            ),
+            FSInputFile(path, filename=filename),
             caption=(
                 "📊 <b>Полный отчёт реферора</b>\n\n"
-                f"👥 Пользователей: <b>{users_count}</b>\n"
+                f"📦 Заявок: <b>{totals['applications']}</b>\n"
+                f"👥 Пользователей: <b>~{users_count}</b>\n"
                 f"📅 Сформирован: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
             ),
             parse_mode="HTML"
@@ -62,6 +57,9 @@ async def admin_full_report(callback: types.CallbackQuery):
             "❌ Ошибка при генерации отчёта.\n"
             "Проверьте логи сервера."
         )
+    finally:
+        if path:
+            os.remove(path)
 
 
 @router.callback_query(F.data == "admin_traffic_dashboard")
@@ -2,13 +2,19 @@ import logging
 
 from aiogram.types import InlineKeyboardButton
 from aiogram import Router, F, types
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from utils.keyboards import get_admin_panel_kb
 from db.banks import get_active_banks
 from db.products import get_products_by_bank
 from db.variants import get_variants_by_product
-from db.referrals import update_referral_link
+from db.referrals import bulk_upsert_referral_links, get_all_referral_links, update_referral_link
+from db.campaigns import create_campaign
+from services.deeplink import encode_payload
+from utils.traffic_sources import TRAFFIC_SOURCES
+from services.link_import import LinkImportError, MAX_ERRORS, links_to_csv, parse_links_file
+from jobs.preshorten_links import schedule_preshorten
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -28,6 +34,10 @@ class UpdateLinkFSM:
     select_product = "update_link_select_product"
     select_variant = "update_link_select_variant"
     input_link = "update_link_input"
+    bulk_upload = "update_link_bulk_upload"
+
+BULK_MAX_FILE_SIZE = 1024 * 1024
+BULK_DIFF_PREVIEW = 15
 
 
 # =========================
@@ -45,6 +55,37 @@ async def admin_panel(callback: types.CallbackQuery):
     )
     await callback.answer()
 
+# -----------------------------
+# Кампании: /campaign <источник> <id автора> <название>
+# -----------------------------
+# Объявлен до update_link_input: тот ловит любой текст админа
+@router.message(Command("campaign"))
+async def cmd_campaign(message: types.Message, command: CommandObject):
+    if not is_admin(message.from_user.id):
+        return
+
+    parts = (command.args or "").split(maxsplit=2)
+    if len(parts) < 3 or parts[0].lower() not in TRAFFIC_SOURCES or not parts[1].isdigit():
+        await message.answer(
+            "Использование: <code>/campaign источник id_автора название</code>\n"
+            "id_автора — 0, если автора нет.\n"
+            f"Источники: {', '.join(TRAFFIC_SOURCES)}",
+            parse_mode="HTML"
+        )
+        return
+
+    source, creator_id, name = parts[0].lower(), int(parts[1]), parts[2]
+    campaign_id = await create_campaign(name, source, creator_id)
+    bot_username = (await message.bot.me()).username
+    payload = encode_payload(source, campaign_id, creator_id)
+
+    await message.answer(
+        f"✅ Кампания #{campaign_id} «{name}» создана\n\n"
+        f"🔗 https://t.me/{bot_username}?start={payload}",
+        disable_web_page_preview=True
+    )
+
+
 # -----------------------------
 # Шаг 1: выбрать банк
 # -----------------------------
@@ -66,6 +107,7 @@ async def handle_update_link_button(callback: types.CallbackQuery):
             callback_data=f"{UpdateLinkFSM.select_bank}:{b['bank_key']}"
         )
     builder.adjust(2)
+    builder.row(InlineKeyboardButton(text="📥 Массовая загрузка (CSV/JSON)", callback_data="admin_links_bulk"))
     kb = builder.as_markup()
 
     await callback.message.answer(
@@ -183,6 +225,44 @@ async def select_variant(callback: types.CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
+# -----------------------------
+# Массовая загрузка: текст вместо файла и отмена
+# -----------------------------
+# Объявлены до update_link_input: тот ловит любой текст админа
+def _bulk_cancel_kb():
+    kb = InlineKeyboardBuilder()
+    kb.button(text="✖️ Отмена", callback_data="admin_links_bulk_cancel")
+    return kb.as_markup()
+
+
+@router.message(StateFilter(UpdateLinkFSM.bulk_upload), F.text)
+async def bulk_links_text(message: types.Message, state: FSMContext):
+    if not is_admin(message.from_user.id):
+        return
+
+    if message.text.strip().lower() in ("отмена", "/cancel"):
+        await state.clear()
+        await message.answer("✖️ Загрузка ссылок отменена")
+        return
+
+    await message.answer(
+        "📎 Жду файл CSV или JSON. Чтобы выйти, нажмите «Отмена».",
+        reply_markup=_bulk_cancel_kb()
+    )
+
+
+@router.callback_query(F.data == "admin_links_bulk_cancel")
+async def bulk_links_cancel(callback: types.CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён.", show_alert=True)
+        return
+
+    if await state.get_state() == UpdateLinkFSM.bulk_upload:
+        await state.clear()
+    await callback.message.answer("✖️ Загрузка ссылок отменена")
+    await callback.answer()
+
+
 # -----------------------------
 # Шаг 5: сохранение ссылки
 # -----------------------------
@@ -223,8 +303,85 @@ async def update_link_input(message: types.Message, state: FSMContext):
         await message.answer(
             f"✅ Ссылка успешно сохранена!\nБанк: {bank_key}\n{target}\n\n🔗 Оригинальная ссылка:\n{base_url}"
         )
+        schedule_preshorten(message.bot)
     else:
         await message.answer("❌ Ошибка при сохранении ссылки")
 
     await state.clear()
 
+
+# -----------------------------
+# Массовая загрузка ссылок
+# -----------------------------
+@router.callback_query(F.data == "admin_links_bulk")
+async def bulk_links_start(callback: types.CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён.", show_alert=True)
+        return
+
+    await state.set_state(UpdateLinkFSM.bulk_upload)
+    links = await get_all_referral_links()
+    await callback.message.answer_document(
+        types.BufferedInputFile(links_to_csv(links), filename="referral_links.csv"),
+        caption=(
+            "📥 Пришлите CSV или JSON с колонками "
+            "<code>bank_key, product_key, variant_key, base_url</code>.\n"
+            "Пустой variant_key — общая ссылка продукта.\n\n"
+            "Выше — текущие ссылки в этом формате: их можно отредактировать и загрузить обратно."
+        ),
+        parse_mode="HTML",
+        reply_markup=_bulk_cancel_kb()
+    )
+    await callback.answer()
+
+
+def _format_bulk_diff(diff: dict) -> str:
+    def target(r: dict) -> str:
+        return f"{r['bank_key']}/{r['product_key']}" + (f"/{r['variant_key']}" if r["variant_key"] else "")
+
+    lines = [
+        "✅ Ссылки загружены",
+        f"➕ Добавлено: {len(diff['added'])}",
+        f"✏️ Изменено: {len(diff['changed'])}",
+        f"▫️ Без изменений: {diff['unchanged']}",
+    ]
+    preview = [f"+ {target(r)}" for r in diff["added"]] + [f"~ {target(r)}" for r in diff["changed"]]
+    if preview:
+        lines.append("")
+        lines.extend(preview[:BULK_DIFF_PREVIEW])
+        if len(preview) > BULK_DIFF_PREVIEW:
+            lines.append(f"… и ещё {len(preview) - BULK_DIFF_PREVIEW}")
+    return "\n".join(lines)
+
+
+@router.message(StateFilter(UpdateLinkFSM.bulk_upload), F.document)
+async def bulk_links_upload(message: types.Message, state: FSMContext):
+    if not is_admin(message.from_user.id):
+        return
+
+    document = message.document
+    if document.file_size and document.file_size > BULK_MAX_FILE_SIZE:
+        await message.answer("❌ Файл больше 1 МБ")
+        return
+
+    content = (await message.bot.download(document)).read()
+    try:
+        rows = parse_links_file(content, document.file_name or "")
+    except LinkImportError as e:
+        errors = "\n".join(e.errors[:MAX_ERRORS])
+        more = f"\n… и ещё {len(e.errors) - MAX_ERRORS}" if len(e.errors) > MAX_ERRORS else ""
+        await message.answer(f"❌ Файл не загружен, ничего не изменено:\n{errors}{more}")
+        return
+
+    try:
+        diff = await bulk_upsert_referral_links(rows)
+    except Exception:
+        logger.exception("bulk_upsert_referral_links failed")
+        await message.answer("❌ Ошибка при сохранении ссылок, ничего не изменено")
+        return
+
+    await state.clear()
+    await message.answer(_format_bulk_diff(diff))
+    if diff["added"] or diff["changed"]:
+        schedule_preshorten(message.bot)
+
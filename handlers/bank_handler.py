@@ -1,18 +1,23 @@
 import logging
+from typing import Callable
 from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from urllib.parse import urlparse, urlencode, urlunparse, parse_qs
-#from db.applications import create_application
 from utils.traffic_sources import DEFAULT_SOURCE
 from utils.keyboards import get_user_bank_kb, get_user_main_menu_kb
 from db.users import get_user
-from db.banks import get_active_banks
-from db.products import get_products_by_bank
-from db.variants import get_variants
-from db.referrals import get_referral_link, shorten_link
-from db.conditions import get_conditions
+from db.catalog import get_catalog
+from db.link_events import record_link_issued
+from utils.callback_data import (
+    ApplyOfferCallback,
+    ProductCallback,
+    ProductConditionsCallback,
+    VariantCallback,
+)
+from db.short_links import lookup_short_link
+from jobs.preshorten_links import request_short_link
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -26,7 +31,7 @@ class UserCatalogFSM(StatesGroup):
 
 
 # -------------------- helpers --------------------
-def build_kb(items: list[dict], callback_prefix: str, back: str | None = None) -> types.InlineKeyboardMarkup:
+def build_kb(items: list[dict], make_callback: Callable[[dict], CallbackData], back: str | None = None) -> types.InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     for item in items:
         key = item.get('product_key') or item.get('variant_key')
@@ -34,7 +39,7 @@ def build_kb(items: list[dict], callback_prefix: str, back: str | None = None) -
             continue
         kb.button(
             text=item.get("product_name") or item.get("title") or str(key),
-            callback_data=f"{callback_prefix}:{key}"
+            callback_data=make_callback(item)
         )
     if back:
         kb.button(text="⬅ Назад", callback_data=back)
@@ -50,34 +55,16 @@ async def build_final_referral_url(
     traffic_source: str
 ) -> str:
 
-    base_url = await get_referral_link(bank_key, product_key, variant_key, shorten=False)
-    if not base_url:
+    final_url = get_catalog().referral_url(bank_key, product_key, variant_key, traffic_source)
+    if not final_url:
         return None
 
-    utm_source = "ReferralFlowBot"
-    utm_medium = traffic_source
-    utm_campaign = variant_key or product_key
-
-    parsed = urlparse(base_url)
-    existing = parse_qs(parsed.query)
-
-    merged = {
-        **existing,
-        "utm_source": utm_source,
-        "utm_medium": utm_medium,
-        "utm_campaign": utm_campaign,
-    }
-
-    merged = {
-        k: v[0] if isinstance(v, list) else v
-        for k, v in merged.items()
-    }
-
-    final_url = urlunparse(
-        parsed._replace(query=urlencode(merged))
-    )
-
-    short_url = await shorten_link(final_url)
+    # Короткие ссылки готовит jobs/preshorten_links.py; на промахе
+    # отдаём длинную ссылку, а сокращение уходит в фон
+    short_url = await lookup_short_link(final_url)
+    if short_url is None:
+        request_short_link(final_url, bank_key, product_key, variant_key)
+        return final_url
     return short_url
 
 
@@ -95,8 +82,8 @@ async def choose_bank(message: types.Message, state: FSMContext):
 @router.message(UserCatalogFSM.choosing_bank, F.text.startswith("🏦"))
 async def bank_selected(message: types.Message, state: FSMContext):
     bank_title = message.text.replace("🏦", "").strip()
-    banks = await get_active_banks()
-    bank = next((b for b in banks if b["bank_title"] == bank_title), None)
+    catalog = get_catalog()
+    bank = catalog.bank_by_title(bank_title)
 
     if not bank:
         await message.answer("⚠️ Банк не найден")
@@ -105,47 +92,48 @@ async def bank_selected(message: types.Message, state: FSMContext):
     await state.update_data(bank_key=bank["bank_key"])
     await state.set_state(UserCatalogFSM.choosing_product)
 
-    products = await get_products_by_bank(bank["bank_key"])
+    products = catalog.products(bank["bank_key"])
     if not products:
         await message.answer("⚠️ Продукты временно недоступны")
         return
 
-    kb = build_kb(products, "user_product")
+    kb = build_kb(products, lambda p: ProductCallback(product_id=p["id"]))
     await message.answer("💳 <b>Выберите продукт:</b>", reply_markup=kb, parse_mode="HTML")
 
 
 # -------------------- choose_variant --------------------
-@router.callback_query(UserCatalogFSM.choosing_product, F.data.startswith("user_product:"))
-async def choose_product(callback: types.CallbackQuery, state: FSMContext):
-    product_key = callback.data.split(":", 1)[1]
+@router.callback_query(UserCatalogFSM.choosing_product, ProductCallback.filter())
+async def choose_product(callback: types.CallbackQuery, callback_data: ProductCallback, state: FSMContext):
     data = await state.get_data()
     bank_key = data.get("bank_key")
     if not bank_key:
         raise RuntimeError("FSM missing bank_key before choose_product")
 
-    products = await get_products_by_bank(bank_key)
-    product = next((p for p in products if str(p["product_key"]) == product_key), None)
-    if not product:
+    catalog = get_catalog()
+    product = catalog.product_by_id(callback_data.product_id)
+    if not product or product["bank_key"] != bank_key:
         await callback.answer("⚠️ Продукт не найден", show_alert=True)
         return
 
+    product_key = str(product["product_key"])
+
     product_name = product.get("product_name") or product.get("title") or product_key
     await state.update_data(product_key=product_key)
 
-    variants = await get_variants(bank_key, product_key)
+    variants = catalog.variants(bank_key, product_key)
     kb = InlineKeyboardBuilder()
 
     # Кнопка просмотра условий продукта вместо прямого оформления
     kb.button(
         text=f"📋 Показать условия {product_name}",
-        callback_data=f"view_product_conditions:{product_key}"
+        callback_data=ProductConditionsCallback(product_id=product["id"])
     )
 
     if variants:
         for v in variants:
             kb.button(
                 text=f"📌 Вариант: {v['title']}",
-                callback_data=f"user_variant:{v['variant_key']}"
+                callback_data=VariantCallback(variant_id=v["id"])
             )
 
     kb.button(text="⬅ Назад", callback_data="choose_bank")
@@ -161,9 +149,8 @@ async def choose_product(callback: types.CallbackQuery, state: FSMContext):
 
 
 # -------------------- show_conditions --------------------
-@router.callback_query(UserCatalogFSM.choosing_variant, F.data.startswith("user_variant:"))
-async def show_conditions(callback: types.CallbackQuery, state: FSMContext):
-    variant_key = callback.data.split(":", 1)[1]
+@router.callback_query(UserCatalogFSM.choosing_variant, VariantCallback.filter())
+async def show_conditions(callback: types.CallbackQuery, callback_data: VariantCallback, state: FSMContext):
     data = await state.get_data()
     product_key = data.get("product_key")
     bank_key = data.get("bank_key")
@@ -172,13 +159,21 @@ async def show_conditions(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer("❌ Ошибка: продукт или банк не выбран.", show_alert=True)
         return
 
+    catalog = get_catalog()
+    variant = catalog.variant_by_id(callback_data.variant_id)
+    product = catalog.product(bank_key, product_key)
+    if not variant or not product or (variant["bank_key"], variant["product_key"]) != (bank_key, product_key):
+        await callback.answer("⚠️ Вариант не найден", show_alert=True)
+        return
+    variant_key = variant["variant_key"]
+
     # Условия варианта
-    variant_conditions = await get_conditions("variant", variant_key)
+    variant_conditions = catalog.conditions("variant", variant_key)
     variant_text = "\n".join(f"{i+1}️⃣ {c['text']}" for i, c in enumerate(variant_conditions)) \
                    if variant_conditions else "Условия для варианта отсутствуют."
 
     # Условия продукта
-    product_conditions = await get_conditions("product", product_key)
+    product_conditions = catalog.conditions("product", product_key)
     product_text = "\n".join(f"{i+1}️⃣ {c['text']}" for i, c in enumerate(product_conditions)) \
                    if product_conditions else "Условия для продукта отсутствуют."
 
@@ -191,8 +186,8 @@ async def show_conditions(callback: types.CallbackQuery, state: FSMContext):
 
     kb = InlineKeyboardBuilder()
     kb.button(text="❌ Отказаться", callback_data="cancel_offer")
-    kb.button(text="✅ Оформить", callback_data=f"apply_offer:{product_key}|{variant_key}")
-    kb.button(text="⬅ Назад", callback_data=f"user_product:{product_key}")
+    kb.button(text="✅ Оформить", callback_data=ApplyOfferCallback(product_id=product["id"], variant_id=variant["id"]))
+    kb.button(text="⬅ Назад", callback_data=ProductCallback(product_id=product["id"]))
     kb.adjust(1)
 
     await callback.message.edit_text(
@@ -206,24 +201,33 @@ async def show_conditions(callback: types.CallbackQuery, state: FSMContext):
 
 
 # -------------------- view_product_conditions --------------------
-@router.callback_query(UserCatalogFSM.choosing_variant, F.data.startswith("view_product_conditions:"))
-async def view_product_conditions(callback: types.CallbackQuery, state: FSMContext):
-    product_key = callback.data.split(":", 1)[1]
-    product_conditions = await get_conditions("product", product_key)
+@router.callback_query(UserCatalogFSM.choosing_variant, ProductConditionsCallback.filter())
+async def view_product_conditions(callback: types.CallbackQuery, callback_data: ProductConditionsCallback, state: FSMContext):
+    catalog = get_catalog()
+    product = catalog.product_by_id(callback_data.product_id)
+    if not product:
+        await callback.answer("⚠️ Продукт не найден", show_alert=True)
+        return
+
+    product_key = str(product["product_key"])
+    product_conditions = catalog.conditions("product", product_key)
     product_text = "\n".join(f"{i+1}️⃣ {c['text']}" for i, c in enumerate(product_conditions)) \
                    if product_conditions else "Условия отсутствуют."
 
     data = await state.get_data()
     variant_key = data.get("variant_key")
+    variant = next((v for v in catalog.variants(product["bank_key"], product_key) if v["variant_key"] == variant_key), None)
 
     kb = InlineKeyboardBuilder()
     kb.button(text="❌ Отказаться", callback_data="cancel_offer")
-    if variant_key:
-        kb.button(text="✅ Оформить", callback_data=f"apply_offer:{product_key}|{variant_key}")
-    else:
-        kb.button(text="✅ Оформить", callback_data=f"apply_offer:{product_key}|0")
-                
-    kb.button(text="⬅ Назад", callback_data=f"user_variant:{variant_key}" if variant_key else f"user_product:{product_key}")
+    kb.button(
+        text="✅ Оформить",
+        callback_data=ApplyOfferCallback(product_id=product["id"], variant_id=variant["id"] if variant else 0)
+    )
+    kb.button(
+        text="⬅ Назад",
+        callback_data=VariantCallback(variant_id=variant["id"]) if variant else ProductCallback(product_id=product["id"])
+    )
     kb.adjust(1)
 
     await callback.message.edit_text(
@@ -235,15 +239,23 @@ async def view_product_conditions(callback: types.CallbackQuery, state: FSMConte
 
 
 # -------------------- apply_offer --------------------
-@router.callback_query(F.data.startswith("apply_offer:"))
-async def apply_offer(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(ApplyOfferCallback.filter())
+async def apply_offer(callback: types.CallbackQuery, callback_data: ApplyOfferCallback, state: FSMContext):
     try:
-        data = await state.get_data()
-        
-        bank_key = data.get("bank_key")
-        if not bank_key:
-            await callback.answer("❌ Ошибка: банк не выбран.", show_alert=True)
+        # Банк и продукт берутся из самой кнопки, а не из FSM: старая кнопка
+        # «Оформить» после выбора другого банка выдаёт ссылку своего продукта
+        catalog = get_catalog()
+        product = catalog.product_by_id(callback_data.product_id)
+        variant = catalog.variant_by_id(callback_data.variant_id) if callback_data.variant_id else None
+        if not product or (callback_data.variant_id and not variant):
+            await callback.answer("⚠️ Продукт не найден", show_alert=True)
+            return
+        bank_key = product["bank_key"]
+        product_key = product["product_key"]
+        if variant and (variant["bank_key"], variant["product_key"]) != (bank_key, product_key):
+            await callback.answer("⚠️ Вариант не найден", show_alert=True)
             return
+        variant_key = variant["variant_key"] if variant else None
 
         user = await get_user(callback.from_user.id)
 
@@ -251,11 +263,6 @@ async def apply_offer(callback: types.CallbackQuery, state: FSMContext):
         if not traffic_source:
             user = await get_user(callback.from_user.id)
             traffic_source = user.get("traffic_source", DEFAULT_SOURCE)
-        
-        payload = callback.data.split(":", 1)[1]
-        product_key, variant_key = payload.split("|") if "|" in payload else (payload, None)
-        if variant_key == "0":
-            variant_key = None
 
         logging.info(
             f"User {callback.from_user.id} is generating a referral link | "
@@ -273,6 +280,11 @@ async def apply_offer(callback: types.CallbackQuery, state: FSMContext):
         if not final_url:
             raise ValueError("Ссылка не найдена")
 
+        # Событие и заявка пишутся пакетом в фоне, коммит хендлер не ждёт
+        record_link_issued(
+            callback.from_user.id, bank_key, str(product_key),
+            str(variant_key) if variant_key else None, traffic_source
+        )
 
         await callback.message.answer(
             f"🔗 Ваша уникальная ссылка:\n{final_url}",
@@ -1,5 +1,5 @@
 from datetime import datetime
-import json
+import logging
 import os
 from aiogram import Router, F, types
 from aiogram.types import CallbackQuery
@@ -11,7 +11,7 @@ from db.finance import (
 )
 
 from db.finance import get_admin_traffic_overview
-from services.referrer_report_generator import generate_admin_dashboard_text, build_referrer_report
+from services.referrer_report_generator import generate_admin_dashboard_text, export_referrer_report
 from utils.keyboards import (
     get_admin_panel_kb,
     get_admin_dashboard_kb,
@@ -22,6 +22,7 @@ from utils.keyboards import (
 
 
 router = Router()
+logger = logging.getLogger(__name__)
 
 
 def is_admin(user_id: int) -> bool:
@@ -219,23 +220,32 @@ async def admin_reports_root(cb: CallbackQuery):
     )
     await cb.answer()
 
-@router.callback_query(F.data == "admin:report:json")
-async def admin_report_json(cb: CallbackQuery):
+@router.callback_query(F.data.in_(["admin:report:json", "admin:report:csv"]))
+async def admin_report_export(cb: CallbackQuery):
     if not is_admin(cb.from_user.id):
         return await cb.answer("⛔️ Нет доступа", show_alert=True)
 
-    report = await build_referrer_report()
-
-    # пока просто отправляем как файл
-    json_bytes = json.dumps(report, indent=2, ensure_ascii=False).encode()
-
-    await cb.message.answer_document(
-        types.BufferedInputFile(
-            json_bytes,
-            filename="admin_report.json"
+    await cb.answer("⏳ Формирую отчёт…")
+
+    # JSON-отчёт отдаётся построчно (NDJSON), чтобы выгрузка шла потоком
+    fmt = "csv" if cb.data.endswith(":csv") else "ndjson"
+    path = None
+    try:
+        path, summary = await export_referrer_report(fmt, compress=True)
+        await cb.message.answer_document(
+            types.FSInputFile(path, filename=f"admin_report.{fmt}.gz"),
+            caption=(
+                f"📦 Заявок: <b>{summary['totals']['applications']}</b>\n"
+                f"👥 Пользователей: <b>~{summary['totals']['users']}</b>"
+            ),
+            parse_mode="HTML"
         )
-    )
-    await cb.answer()
+    except Exception:
+        logger.exception("admin_report_export failed")
+        await cb.message.answer("❌ Не удалось сформировать отчёт. Попробуйте позже.")
+    finally:
+        if path is not None:
+            os.remove(path)
 
 @router.callback_query(F.data == "admin_back")
 async def admin_back(callback: CallbackQuery):
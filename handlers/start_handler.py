@@ -5,6 +5,8 @@ from aiogram.fsm.state import State, StatesGroup
 
 from utils.traffic_sources import TRAFFIC_SOURCES, DEFAULT_SOURCE
 from db.users import user_exists, create_user
+from db.campaigns import get_campaign
+from services.deeplink import parse_start_payload
 from utils.validation import is_valid_full_name
 from utils.keyboards import (
     get_start_kb,
@@ -31,19 +33,26 @@ async def cmd_start(message: types.Message, state: FSMContext):
     # Определяем источник трафика
     # ------------------------------
     source_key = DEFAULT_SOURCE
-    source_data = TRAFFIC_SOURCES.get(DEFAULT_SOURCE)
+    campaign_id = creator_id = None
 
-    # Deep-link передает source через /start source_key
+    # Deep-link: /start source_key или подписанный payload с кампанией и автором
     if message.text:
         parts = message.text.split(maxsplit=1)
         if len(parts) > 1:
-            raw = parts[1].lower()
-            if raw in TRAFFIC_SOURCES:
-                source_key = raw
-                source_data = TRAFFIC_SOURCES[raw]
+            link = parse_start_payload(parts[1].strip())
+            if link is not None:
+                source_key = link.source
+                # Выключенная, неизвестная или чужого источника кампания:
+                # источник оставляем, кампанию и автора — нет
+                campaign = get_campaign(link.campaign_id) if link.campaign_id else None
+                if campaign and campaign["traffic_source"] == link.source:
+                    campaign_id = link.campaign_id
+                    creator_id = link.creator_id or None
+
+    source_data = TRAFFIC_SOURCES[source_key]
 
     # Сохраняем source в FSM, чтобы потом использовать при генерации ссылок
-    await state.update_data(traffic_source=source_key)
+    await state.update_data(traffic_source=source_key, campaign_id=campaign_id, creator_id=creator_id)
 
     # ------------------------------
     # Уже зарегистрированные пользователи
@@ -107,7 +116,9 @@ async def process_name(message: types.Message, state: FSMContext):
     await create_user(
         user_id=message.from_user.id,
         full_name=full_name,
-        source=data.get("traffic_source", DEFAULT_SOURCE)
+        source=data.get("traffic_source", DEFAULT_SOURCE),
+        campaign_id=data.get("campaign_id"),
+        creator_id=data.get("creator_id"),
     )
 
     await state.clear()
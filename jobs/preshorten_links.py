@@ -0,0 +1,199 @@
+"""
+Фоновое сокращение всех реферальных ссылок заранее.
+
+Множество итоговых URL полностью задано строками referral_links
+(с учётом запасной ссылки продукта для вариантов) × TRAFFIC_SOURCES,
+поэтому его можно перебрать и сократить до того, как пользователь нажмёт
+«Оформить». apply_offer после этого только читает кэш short_links.
+
+Запускается при старте бота (только лог) и после изменения ссылки в
+админке (с сообщением о прогрессе админам).
+"""
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+
+from config import settings
+from db.catalog import get_catalog
+from db.referrals import get_short_link
+from db.short_links import lookup_short_link
+from services.shortener import get_shortener
+from utils.traffic_sources import TRAFFIC_SOURCES
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_EVERY = 50
+
+
+# =========================
+# RATE LIMIT
+# =========================
+_rate_lock = asyncio.Lock()
+_last_call = 0.0
+
+
+async def _throttle():
+    """Не чаще PRESHORTEN_RATE запросов в секунду к сокращателю."""
+    global _last_call
+    async with _rate_lock:
+        delay = _last_call + 1 / settings.PRESHORTEN_RATE - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        _last_call = time.monotonic()
+
+
+async def _shorten_with_retry(long_url: str, bank_key: str, product_key: str, variant_key: str | None) -> bool:
+    for attempt in range(settings.PRESHORTEN_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(2 ** (attempt - 1))
+        if get_shortener().remote:
+            await _throttle()
+        # get_short_link() возвращает длинный URL, если сократить не удалось
+        if await get_short_link(long_url, bank_key, product_key, variant_key) != long_url:
+            return True
+    logger.warning("Pre-shortening gave up on %s", long_url)
+    return False
+
+
+# =========================
+# TARGETS
+# =========================
+def iter_final_urls():
+    """
+    Все ссылки, которые может запросить пользователь: собственные ссылки
+    вариантов и продуктов плюс варианты, использующие ссылку продукта.
+    """
+    catalog = get_catalog()
+    for bank_key, product_key, variant_key in catalog.link_targets():
+        for source in TRAFFIC_SOURCES:
+            yield catalog.referral_url(bank_key, product_key, variant_key, source), bank_key, product_key, variant_key
+
+
+# =========================
+# PROGRESS
+# =========================
+class _Progress:
+    """
+    Одно сообщение каждому админу, обновляется раз в PROGRESS_EVERY ссылок.
+    Отправляется при первой ссылке, которую действительно нужно сокращать:
+    прогон, где всё уже в кэше, админов не беспокоит.
+    """
+
+    def __init__(self, bot: Bot | None):
+        self.bot = bot
+        self.started = False
+        self.messages: list = []
+
+    async def start(self, text: str):
+        if self.bot is None or self.started:
+            return
+        self.started = True
+        for admin_id in settings.ADMIN_IDS:
+            try:
+                self.messages.append(await self.bot.send_message(admin_id, text))
+            except Exception:
+                logger.warning("Pre-shortening: cannot notify admin %s", admin_id)
+
+    async def update(self, text: str):
+        for message in self.messages:
+            try:
+                await message.edit_text(text)
+            except Exception:
+                pass
+
+
+def _progress_text(done: int, shortened: int, cached: int, failed: int, finished: bool = False) -> str:
+    head = "✅ Сокращение ссылок завершено" if finished else "⏳ Сокращение ссылок…"
+    return (
+        f"{head}\n"
+        f"Обработано: {done}\n"
+        f"Сокращено: {shortened}\n"
+        f"Уже в кэше: {cached}\n"
+        f"Ошибок: {failed}"
+    )
+
+
+# =========================
+# JOB
+# =========================
+async def preshorten_all(bot: Bot | None = None) -> dict:
+    if get_shortener().name == "none":
+        return {"done": 0, "shortened": 0, "cached": 0, "failed": 0}
+
+    progress = _Progress(bot)
+
+    done = shortened = cached = failed = 0
+    for long_url, bank_key, product_key, variant_key in iter_final_urls():
+        if await lookup_short_link(long_url) is not None:
+            cached += 1
+        else:
+            await progress.start(_progress_text(done, shortened, cached, failed))
+            if await _shorten_with_retry(long_url, bank_key, product_key, variant_key):
+                shortened += 1
+            else:
+                failed += 1
+        done += 1
+        if done % PROGRESS_EVERY == 0:
+            await progress.update(_progress_text(done, shortened, cached, failed))
+
+    await progress.update(_progress_text(done, shortened, cached, failed, finished=True))
+    logger.info("Pre-shortening done: %s urls, %s shortened, %s cached, %s failed", done, shortened, cached, failed)
+    return {"done": done, "shortened": shortened, "cached": cached, "failed": failed}
+
+
+_task: asyncio.Task | None = None
+_rerun = False
+_rerun_bot: Bot | None = None
+
+
+def schedule_preshorten(bot: Bot | None = None):
+    """
+    Запускает preshorten_all() в фоне. Если прогон уже идёт,
+    после него будет ровно один повторный — с актуальными ссылками.
+    bot передаётся только из админки: без него прогресс пишется лишь в лог.
+    """
+    global _task, _rerun, _rerun_bot
+    if _task is not None and not _task.done():
+        _rerun = True
+        _rerun_bot = _rerun_bot or bot
+        return
+
+    async def run():
+        global _rerun, _rerun_bot
+        run_bot = bot
+        while True:
+            _rerun = False
+            try:
+                await preshorten_all(run_bot)
+            except Exception:
+                logger.exception("Pre-shortening failed")
+            if not _rerun:
+                break
+            run_bot, _rerun_bot = _rerun_bot, None
+
+    _task = asyncio.create_task(run())
+
+
+_pending: set[str] = set()
+_background: set[asyncio.Task] = set()
+
+
+def request_short_link(long_url: str, bank_key: str, product_key: str, variant_key: str | None = None):
+    """Промах кэша в apply_offer: сокращаем одну ссылку в фоне, без повторов в очереди."""
+    if long_url in _pending or get_shortener().name == "none":
+        return
+    _pending.add(long_url)
+
+    async def run():
+        try:
+            await _shorten_with_retry(long_url, bank_key, product_key, variant_key)
+        except Exception:
+            logger.exception("Background shortening failed")
+        finally:
+            _pending.discard(long_url)
+
+    task = asyncio.create_task(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
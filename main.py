@@ -4,15 +4,22 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import asyncio
 import logging
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram import Bot, Dispatcher
 from config import settings
 from db.init import initialize_database
-from db.base import db_health_check
+from db.base import db_health_check, close_db_pool, checkpoint_wal
+from db.write_behind import stop_write_behind
+from db.catalog import load_catalog
+from db.campaigns import load_campaigns
+from db.fsm_storage import SQLiteStorage
+from services.http_client import close_http_session
+from services.redirect_server import start_redirect_server, stop_redirect_server
+from services.webhook_server import run_webhook
 from core.bot_instance import setup_bot
 from aiogram.types import BotCommand
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from jobs.weekly_report_job import send_weekly_report
+from jobs.preshorten_links import schedule_preshorten
 
 
 async def set_bot_commands(bot: Bot):
@@ -25,10 +32,12 @@ async def set_bot_commands(bot: Bot):
 async def main():
     await initialize_database()
     await db_health_check()
+    await load_catalog()
+    await load_campaigns()
     print("🚀 Функция initialize_database() вызвана!")
     logging.basicConfig(level=logging.INFO)
     bot = Bot(token=settings.BOT_TOKEN)
-    storage = MemoryStorage()
+    storage = SQLiteStorage()
     dp = Dispatcher(storage=storage)
     await setup_bot(dp, bot)
     scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
@@ -40,10 +49,35 @@ async def main():
         minute=0,
         args=[bot]
     )
+    if settings.DB_WAL_MODE:
+        scheduler.add_job(
+            checkpoint_wal,
+            "interval",
+            seconds=settings.DB_WAL_CHECKPOINT_INTERVAL
+        )
+    scheduler.add_job(
+        storage.evict,
+        "interval",
+        seconds=settings.FSM_EVICT_INTERVAL
+    )
     scheduler.start()
-    await bot.delete_webhook(drop_pending_updates=True)
+    if settings.SHORTENER_BACKEND == "local":
+        await start_redirect_server()
+    schedule_preshorten()
     print("🚀 Бот запускается...")
-    await dp.start_polling(bot)
+    try:
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=settings.DROP_PENDING_UPDATES)
+            await dp.start_polling(bot)
+    finally:
+        await stop_redirect_server()
+        await close_http_session()
+        # FSM сбрасывает грязные состояния в write-behind очередь — до её остановки
+        await storage.close()
+        await stop_write_behind()
+        await close_db_pool()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
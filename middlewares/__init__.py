@@ -0,0 +1,3 @@
+from .fsm_context import BufferedFSMContext, FSMBufferMiddleware
+from .scheduler import UpdateScheduler
+from .throttling import ThrottlingMiddleware
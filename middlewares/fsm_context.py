@@ -0,0 +1,96 @@
+"""
+FSM-контекст, привязанный к одному апдейту.
+
+Штатный FSMContext ходит в хранилище на каждый get_data/update_data/
+set_state. BufferedFSMContext берёт состояние из raw_state (его уже
+прочитал FSMContextMiddleware для фильтров), данные читает лениво при
+первом обращении, а изменения копит в памяти. После хендлера
+FSMBufferMiddleware записывает их одной операцией: на апдейт приходится
+не больше одного чтения данных и одной записи, как бы ни был написан
+хендлер.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject
+
+from db.fsm_storage import SQLiteStorage
+
+
+class BufferedFSMContext(FSMContext):
+    def __init__(self, storage: BaseStorage, key: StorageKey, state: Optional[str]):
+        super().__init__(storage, key)
+        self._state = state
+        self._data: Optional[Dict[str, Any]] = None
+        self._state_dirty = False
+        self._data_dirty = False
+
+    async def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+        return self._data
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_dirty = True
+
+    async def get_state(self) -> Optional[str]:
+        return self._state
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self._data = data.copy()
+        self._data_dirty = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        return (await self._load()).copy()
+
+    async def update_data(
+        self, data: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current = await self._load()
+        current.update(kwargs)
+        self._data_dirty = True
+        return current.copy()
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения; без изменений в хранилище не ходит."""
+        if self._state_dirty and self._data_dirty and isinstance(self.storage, SQLiteStorage):
+            await self.storage.set_record(self.key, self._state, self._data)
+        else:
+            if self._state_dirty:
+                await self.storage.set_state(key=self.key, state=self._state)
+            if self._data_dirty:
+                await self.storage.set_data(key=self.key, data=self._data)
+        self._state_dirty = self._data_dirty = False
+
+
+class FSMBufferMiddleware(BaseMiddleware):
+    """
+    Outer-middleware апдейтов. Регистрируется после FSMContextMiddleware
+    диспетчера (тот ставится в Dispatcher.__init__), поэтому видит готовые
+    data["state"] и data["raw_state"] и подменяет контекст буферизующим.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context = data.get("state")
+        if context is None:
+            return await handler(event, data)
+
+        buffered = BufferedFSMContext(context.storage, context.key, data.get("raw_state"))
+        data["state"] = buffered
+        try:
+            return await handler(event, data)
+        finally:
+            # И при ошибке хендлера: прежний FSMContext писал сразу,
+            # изменения до исключения тоже сохранялись
+            await buffered.flush()
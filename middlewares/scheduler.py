@@ -0,0 +1,148 @@
+"""
+Планировщик апдейтов.
+
+aiogram обрабатывает апдейты параллельно и без ограничений: всплеск
+порождает тысячи хендлеров, одновременно открывающих соединения с БД, а
+двойное нажатие «✅ Оформить» запускает два apply_offer на одних и тех же
+FSM-данных. UpdateScheduler:
+
+- держит очередь на каждого user_id — апдейты пользователя выполняются
+  строго по одному, в порядке поступления (asyncio.Lock справедлив);
+- ограничивает число одновременно работающих хендлеров
+  (UPDATE_MAX_IN_FLIGHT), остальные ждут;
+- отбрасывает апдейт, если в очереди пользователя уже
+  UPDATE_USER_QUEUE_MAX апдейтов или всего ждут UPDATE_MAX_PENDING.
+
+Стоит перед FSMContextMiddleware (см. install()), поэтому состояние
+читается уже после того, как предыдущий апдейт пользователя его записал.
+"""
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import EVENT_CONTEXT_KEY
+from aiogram.types import TelegramObject, Update
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SHED_LOG_INTERVAL = 10
+
+
+class _UserQueue:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class UpdateScheduler(BaseMiddleware):
+    def __init__(
+        self,
+        max_in_flight: int = settings.UPDATE_MAX_IN_FLIGHT,
+        max_pending: int = settings.UPDATE_MAX_PENDING,
+        user_queue_max: int = settings.UPDATE_USER_QUEUE_MAX,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_pending = max_pending
+        self.user_queue_max = max(1, user_queue_max)
+
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._queues: Dict[int, _UserQueue] = {}
+
+        # счётчики
+        self._in_flight = 0
+        self._pending = 0
+        self._max_pending_seen = 0
+        self._processed = 0
+        self._shed = 0
+        self._wait_total = 0.0
+        self._last_shed_log = 0.0
+
+    def install(self, dp: Dispatcher):
+        """
+        Встраивает планировщик между UserContextMiddleware (даёт user_id)
+        и FSMContextMiddleware: outer-middleware выполняются в порядке
+        регистрации, поэтому FSM перерегистрируется после планировщика.
+        """
+        dp.update.outer_middleware.unregister(dp.fsm)
+        dp.update.outer_middleware(self)
+        dp.update.outer_middleware(dp.fsm)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        event_context = data.get(EVENT_CONTEXT_KEY)
+        user_id: Optional[int] = event_context.user_id if event_context else None
+
+        queue = None
+        if user_id is not None:
+            queue = self._queues.get(user_id)
+            if queue is None:
+                queue = self._queues[user_id] = _UserQueue()
+            if queue.depth >= self.user_queue_max or self._pending >= self.max_pending:
+                if queue.depth == 0:
+                    del self._queues[user_id]
+                return await self._shed_update(event)
+            queue.depth += 1
+        elif self._pending >= self.max_pending:
+            return await self._shed_update(event)
+
+        self._pending += 1
+        self._max_pending_seen = max(self._max_pending_seen, self._pending)
+        waiting = True
+        enqueued = time.monotonic()
+        try:
+            async with queue.lock if queue is not None else nullcontext():
+                async with self._slots:
+                    waiting = False
+                    self._pending -= 1
+                    self._wait_total += time.monotonic() - enqueued
+                    self._in_flight += 1
+                    try:
+                        return await handler(event, data)
+                    finally:
+                        self._in_flight -= 1
+                        self._processed += 1
+        finally:
+            # Отменён, не дождавшись своей очереди
+            if waiting:
+                self._pending -= 1
+            if queue is not None:
+                queue.depth -= 1
+                if queue.depth == 0:
+                    self._queues.pop(user_id, None)
+
+    async def _shed_update(self, event: TelegramObject) -> None:
+        self._shed += 1
+        now = time.monotonic()
+        if now - self._last_shed_log >= SHED_LOG_INTERVAL:
+            self._last_shed_log = now
+            logger.warning("Update queue is full, shedding updates: %s", self.stats())
+
+        # Иначе у пользователя бесконечно крутится индикатор на кнопке
+        if isinstance(event, Update) and event.callback_query is not None:
+            try:
+                await event.callback_query.answer("⏳ Слишком много запросов, попробуйте через пару секунд")
+            except Exception as e:
+                logger.debug("Failed to answer shed callback: %s", e)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "pending": self._pending,
+            "max_pending": self._max_pending_seen,
+            "users_queued": len(self._queues),
+            "processed": self._processed,
+            "shed": self._shed,
+            "avg_wait_ms": round(self._wait_total / self._processed * 1000, 1) if self._processed else 0.0,
+        }
@@ -0,0 +1,94 @@
+"""
+Входящий троттлинг: вёдра токенов на пользователя, на чат и на пару
+(пользователь, семейство хендлеров). Семейство — модуль хендлера
+(handlers.bank_handler, handlers.profile_handler, ...) или флаг
+throttling_key, если хендлеру нужно своё ведро.
+
+Регистрируется inner-middleware на message и callback_query диспетчера:
+хендлер уже выбран, поэтому известно семейство. Апдейт сверх лимита
+не доходит до хендлера; нажатие кнопки при этом гасится ответом на
+callback, сообщение — коротким предупреждением не чаще раза в
+NOTICE_INTERVAL секунд.
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from config import settings
+from utils.token_bucket import KeyedBuckets
+
+logger = logging.getLogger(__name__)
+
+NOTICE_INTERVAL = 10
+THROTTLED_TEXT = "⏳ Слишком часто, подождите пару секунд"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self):
+        self.users = KeyedBuckets(settings.THROTTLE_USER_RATE, settings.THROTTLE_USER_BURST)
+        self.chats = KeyedBuckets(settings.THROTTLE_CHAT_RATE, settings.THROTTLE_CHAT_BURST)
+        self.families = KeyedBuckets(settings.THROTTLE_FAMILY_RATE, settings.THROTTLE_FAMILY_BURST)
+        self._notified: Dict[int, float] = {}
+        self._throttled = 0
+
+    def install(self, dp: Dispatcher):
+        dp.message.middleware(self)
+        dp.callback_query.middleware(self)
+
+    @staticmethod
+    def _family(data: Dict[str, Any]) -> str:
+        key = get_flag(data, "throttling_key")
+        if key:
+            return key
+        handler = data.get("handler")
+        return handler.callback.__module__ if handler is not None else ""
+
+    def _allowed(self, user_id: int, chat_id: int | None, family: str) -> bool:
+        if not self.users.get(user_id).try_acquire():
+            return False
+        # В личке chat_id == user_id — второе ведро ничего не добавляет
+        if chat_id is not None and chat_id != user_id and not self.chats.get(chat_id).try_acquire():
+            return False
+        return self.families.get((user_id, family)).try_acquire()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is None or user.id in settings.ADMIN_IDS:
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            chat_id = event.message.chat.id if event.message else None
+        else:
+            chat_id = event.chat.id
+
+        if self._allowed(user.id, chat_id, self._family(data)):
+            return await handler(event, data)
+
+        self._throttled += 1
+        if isinstance(event, CallbackQuery):
+            await event.answer(THROTTLED_TEXT)
+        elif isinstance(event, Message):
+            now = time.monotonic()
+            if now - self._notified.get(user.id, 0) >= NOTICE_INTERVAL:
+                if len(self._notified) >= self.users.max_keys:
+                    self._notified.clear()
+                self._notified[user.id] = now
+                await event.answer(THROTTLED_TEXT)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "throttled": self._throttled,
+            "users": len(self.users),
+            "chats": len(self.chats),
+            "families": len(self.families),
+        }
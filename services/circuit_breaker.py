@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# =========================
+# CIRCUIT BREAKER
+# =========================
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса с бюджетом времени на вызов.
+
+    closed    — вызовы идут, после failure_threshold ошибок подряд -> open;
+    open      — вызовы сразу отклоняются (CircuitOpenError) reset_timeout секунд;
+    half_open — пропускается один пробный вызов: успех -> closed, ошибка -> open.
+
+    При hedge=True, если ответа нет дольше p95 успешных вызовов, параллельно
+    отправляется второй такой же запрос; побеждает первый успешный.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        budget: float,
+        failure_threshold: int,
+        reset_timeout: float,
+        hedge: bool = True,
+        latency_window: int = 200,
+    ):
+        self.name = name
+        self.budget = budget
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+
+        # счётчики
+        self._calls = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._transitions = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        logger.warning("Circuit %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._transitions[state] += 1
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+
+    def _allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def _on_success(self, latency: float):
+        self._latencies.append(latency)
+        self._failures = 0
+        self._probe_in_flight = False
+        self._set_state(CLOSED)
+
+    def _on_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._set_state(OPEN)
+
+    def p95(self) -> float | None:
+        if len(self._latencies) < 20:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    async def _hedged(self, factory: Callable[[], Awaitable[T]]) -> T:
+        tasks = [asyncio.ensure_future(factory())]
+        try:
+            hedge_after = self.p95() if self.hedge else None
+            if hedge_after is None or hedge_after >= self.budget:
+                return await tasks[0]
+
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return tasks[0].result()
+
+            self._hedges += 1
+            tasks.append(asyncio.ensure_future(factory()))
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self._hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Проигравший запрос и запросы, прерванные бюджетом, не висят в фоне
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        factory создаёт новую корутину запроса (для hedging нужна вторая копия).
+        Ошибки и превышение бюджета пробрасываются вызывающему.
+        """
+        if not self._allow():
+            self._rejected += 1
+            raise CircuitOpenError(f"circuit {self.name} is open")
+
+        self._calls += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._hedged(factory), timeout=self.budget)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            self._on_failure()
+            raise
+        except asyncio.CancelledError:
+            self._probe_in_flight = False
+            raise
+        except Exception:
+            self._errors += 1
+            self._on_failure()
+            raise
+
+        self._on_success(time.monotonic() - started)
+        return result
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "calls": self._calls,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "errors": self._errors,
+            "hedged": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+            "opened": self._transitions[OPEN],
+            "half_opened": self._transitions[HALF_OPEN],
+            "closed": self._transitions[CLOSED],
+        }
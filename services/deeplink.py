@@ -0,0 +1,112 @@
+"""
+Подписанный payload для /start: источник трафика, id кампании и id автора.
+
+Формат (до base64url без '='):
+    версия (1 байт) | индекс источника (1 байт) | varint кампании |
+    varint автора | HMAC-SHA256, первые 8 байт
+
+Даже с telegram id автора это не больше 32 символов при лимите Telegram 64.
+Разбор не ходит в БД: проверка подписи и поиск по словарям в памяти.
+Индекс источника — позиция в TRAFFIC_SOURCES, поэтому новые источники
+добавляются только в конец словаря.
+"""
+import base64
+import hashlib
+import hmac
+from dataclasses import dataclass
+
+from config import settings
+from utils.traffic_sources import TRAFFIC_SOURCES
+
+VERSION = 1
+MAC_SIZE = 8
+
+_SOURCES = list(TRAFFIC_SOURCES)
+_SOURCE_INDEX = {key: i for i, key in enumerate(_SOURCES)}
+
+
+@dataclass(frozen=True)
+class DeepLink:
+    source: str
+    campaign_id: int = 0
+    creator_id: int = 0
+
+
+def _secret() -> bytes:
+    return (settings.DEEPLINK_SECRET or f"deeplink:{settings.BOT_TOKEN}").encode()
+
+
+def _sign(body: bytes) -> bytes:
+    return hmac.new(_secret(), body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def _put_varint(out: bytearray, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("обрезанный varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_payload(source: str, campaign_id: int = 0, creator_id: int = 0) -> str:
+    if source not in _SOURCE_INDEX:
+        raise ValueError(f"Неизвестный источник трафика: {source}")
+    if campaign_id < 0 or creator_id < 0:
+        raise ValueError("campaign_id и creator_id должны быть неотрицательными")
+
+    body = bytearray((VERSION, _SOURCE_INDEX[source]))
+    _put_varint(body, campaign_id)
+    _put_varint(body, creator_id)
+    body += _sign(bytes(body))
+    return base64.urlsafe_b64encode(bytes(body)).rstrip(b"=").decode()
+
+
+def decode_payload(payload: str) -> DeepLink | None:
+    """None, если payload не наш или подпись не сошлась."""
+    if len(payload) > 64:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+    except (ValueError, TypeError):
+        return None
+    if len(data) < 4 + MAC_SIZE or data[0] != VERSION:
+        return None
+
+    body, mac = data[:-MAC_SIZE], data[-MAC_SIZE:]
+    if not hmac.compare_digest(mac, _sign(body)):
+        return None
+
+    try:
+        campaign_id, pos = _get_varint(body, 2)
+        creator_id, pos = _get_varint(body, pos)
+    except ValueError:
+        return None
+    if pos != len(body) or body[1] >= len(_SOURCES):
+        return None
+    return DeepLink(_SOURCES[body[1]], campaign_id, creator_id)
+
+
+def parse_start_payload(payload: str) -> DeepLink | None:
+    """
+    Аргумент /start: подписанный payload либо, как раньше,
+    голый ключ источника из TRAFFIC_SOURCES.
+    """
+    if payload.lower() in TRAFFIC_SOURCES:
+        return DeepLink(payload.lower())
+    return decode_payload(payload)
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# SHARED CLIENT SESSION
+# =========================
+_session: aiohttp.ClientSession | None = None
+_session_lock = asyncio.Lock()
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Общая на процесс aiohttp-сессия: keep-alive соединения переиспользуются,
+    TLS-рукопожатие и DNS-запрос выполняются один раз на хост.
+    Создаётся лениво (нужен запущенный event loop), закрывается close_http_session().
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        return _session
+
+    async with _session_lock:
+        if _session is None or _session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_POOL_LIMIT,
+                limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                connect=settings.HTTP_CONNECT_TIMEOUT,
+                sock_read=settings.HTTP_READ_TIMEOUT,
+            )
+            _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logger.info("HTTP client session opened")
+    return _session
+
+
+async def close_http_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+        logger.info("HTTP client session closed")
@@ -0,0 +1,114 @@
+"""
+Разбор и проверка файла с реферальными ссылками для массовой загрузки.
+
+Форматы:
+    CSV  — заголовок bank_key,product_key,variant_key,base_url
+           (variant_key пустой — общая ссылка продукта);
+    JSON — список объектов с теми же полями.
+
+Файл принимается только целиком: при любой ошибке ничего не пишется.
+"""
+import csv
+import io
+import json
+
+from db.catalog import get_catalog
+
+FIELDS = ("bank_key", "product_key", "variant_key", "base_url")
+MAX_ERRORS = 20
+
+
+class LinkImportError(ValueError):
+    def __init__(self, errors: list[str]):
+        self.errors = errors
+        super().__init__("; ".join(errors[:MAX_ERRORS]))
+
+
+def _read_rows(content: bytes, filename: str) -> list[dict]:
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        data = json.loads(text)
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise LinkImportError(["JSON должен быть списком объектов"])
+        return data
+
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"bank_key", "product_key", "base_url"} - set(reader.fieldnames or ())
+    if missing:
+        raise LinkImportError([f"В заголовке CSV нет колонок: {', '.join(sorted(missing))}"])
+    return list(reader)
+
+
+def parse_links_file(content: bytes, filename: str) -> list[dict]:
+    """
+    Возвращает нормализованные строки (ключи в нижнем регистре, пустой
+    variant_key -> None) или бросает LinkImportError со списком ошибок.
+    """
+    try:
+        raw_rows = _read_rows(content, filename)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise LinkImportError([f"Не удалось прочитать файл: {e}"])
+
+    catalog = get_catalog()
+    rows: list[dict] = []
+    errors: list[str] = []
+    seen: dict[tuple, str] = {}
+
+    # Строка 1 в CSV — заголовок; в JSON элементы нумеруются с 1
+    if filename.lower().endswith(".json"):
+        label, start = "элемент {}", 1
+    else:
+        label, start = "строка {}", 2
+
+    for number, raw in enumerate(raw_rows, start=start):
+        where = label.format(number)
+        row = {
+            field: str(raw.get(field) or "").strip()
+            for field in FIELDS
+        }
+        bank_key = row["bank_key"].lower()
+        product_key = row["product_key"].lower()
+        variant_key = row["variant_key"] or None
+        base_url = row["base_url"]
+
+        if not bank_key or not product_key:
+            errors.append(f"{where}: не указан bank_key или product_key")
+            continue
+        if not base_url.startswith(("http://", "https://")):
+            errors.append(f"{where}: URL должен начинаться с http:// или https://")
+            continue
+        if catalog.product(bank_key, product_key) is None:
+            errors.append(f"{where}: нет продукта {bank_key}/{product_key}")
+            continue
+        if variant_key and variant_key not in {v["variant_key"] for v in catalog.variants(bank_key, product_key)}:
+            errors.append(f"{where}: нет варианта {variant_key} у {bank_key}/{product_key}")
+            continue
+
+        key = (bank_key, product_key, variant_key)
+        if key in seen:
+            errors.append(f"{where}: повтор ({seen[key]})")
+            continue
+        seen[key] = where
+
+        rows.append({
+            "bank_key": bank_key,
+            "product_key": product_key,
+            "variant_key": variant_key,
+            "base_url": base_url,
+        })
+
+    if errors:
+        raise LinkImportError(errors)
+    if not rows:
+        raise LinkImportError(["Файл не содержит ни одной ссылки"])
+    return rows
+
+
+def links_to_csv(links: list[dict]) -> bytes:
+    """Текущие ссылки в том же формате, что принимает загрузка."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for link in links:
+        writer.writerow({**link, "variant_key": link["variant_key"] or ""})
+    return buffer.getvalue().encode("utf-8-sig")
@@ -0,0 +1,52 @@
+"""
+HTTP-сервер коротких ссылок backend "local": GET /<code> -> 302 на длинный URL.
+Запускается из main.py, только если SHORTENER_BACKEND=local.
+"""
+import logging
+
+from aiohttp import web
+
+from config import settings
+from db.local_links import record_click, resolve_code
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_redirect(request: web.Request) -> web.Response:
+    code = request.match_info["code"]
+    long_url = await resolve_code(code)
+    if long_url is None:
+        raise web.HTTPNotFound()
+
+    record_click(code)
+    raise web.HTTPFound(long_url)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/{code:[0-9A-Za-z]+}", handle_redirect)
+    return app
+
+
+_runner: web.AppRunner | None = None
+
+
+async def start_redirect_server():
+    global _runner
+    _runner = web.AppRunner(create_app(), access_log=None)
+    await _runner.setup()
+    site = web.TCPSite(_runner, settings.REDIRECT_HOST, settings.REDIRECT_PORT)
+    await site.start()
+    logger.info("Redirect server listening on %s:%s", settings.REDIRECT_HOST, settings.REDIRECT_PORT)
+
+
+async def stop_redirect_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
@@ -1,6 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from collections import defaultdict
+from typing import AsyncIterator
 from db.base import get_db_connection
+from db.rollups import get_users_with_applications_count
+from db.sketches import count_distinct_users_by_source
+from utils.dates import MSK, msk_week_start
+from utils.hll import HyperLogLog
+from services.report_export import export_rows
 
 # ==============================
 # Referrer / Admin reports
@@ -12,10 +18,7 @@ async def generate_admin_dashboard_text() -> str:
     Простая текстовая сводка для админа.
     Сейчас выводит только количество пользователей с заявками.
     """
-    async with get_db_connection() as db:
-        async with db.execute("SELECT COUNT(DISTINCT user_id) FROM applications") as cursor:
-            row = await cursor.fetchone()
-            users_count = row[0] if row else 0
+    users_count = await get_users_with_applications_count()
 
     text = (
         "📊 <b>Дашборд админа</b>\n\n"
@@ -26,104 +29,171 @@ async def generate_admin_dashboard_text() -> str:
     return text
 
 
-async def get_all_applications():
+EXPORT_CHUNK_SIZE = 1000
+
+APPLICATION_FIELDS = ["application_id", "user_id", "bank", "product_key", "variant_key", "created_at"]
+
+
+async def iter_applications(chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[list[dict]]:
     """
-    Получение всех заявок с актуальными полями.
-    Подготовка к будущему экспорту PDF или JSON.
+    Все заявки пачками по chunk_size в порядке id (порядке создания).
+    Keyset-пагинация по id: соединение не держится открытым между
+    пачками и не блокирует запись на время экспорта. Пагинация по
+    created_at обрывалась бы на строке с NULL в created_at.
     """
-    async with get_db_connection() as db:
-        async with db.execute("""
-            SELECT
-                id,
-                user_id,
-                bank_key,
-                product_key,
-                variant_key,
-                created_at
-            FROM applications
-            ORDER BY created_at ASC
-        """) as cursor:
+    last_id = 0
+    while True:
+        async with get_db_connection(readonly=True) as db:
+            cursor = await db.execute("""
+                SELECT id, user_id, bank_key, product_key, variant_key, created_at
+                FROM applications
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, chunk_size))
             rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
 
+        if not rows:
+            return
 
-async def build_referrer_report():
+        last_id = rows[-1]["id"]
+        yield [
+            {
+                "application_id": row["id"],
+                "user_id": row["user_id"],
+                "bank": row["bank_key"],
+                "product_key": row["product_key"],
+                "variant_key": row["variant_key"],
+                "created_at": row["created_at"]
+            }
+            for row in rows
+        ]
+
+        if len(rows) < chunk_size:
+            return
+
+
+class ReferrerReportSummary:
     """
-    Основной отчёт для админа.
-    Можно использовать как для JSON, так и для будущего PDF.
+    Итоги отчёта, накапливаемые за один проход по заявкам.
+    Уникальные пользователи считаются HLL-скетчами вместо set():
+    память не растёт с историей, скетчи банков сливаются в общий итог.
     """
-    applications = await get_all_applications()
-    now = datetime.utcnow().isoformat()
 
-    totals = {
-        "applications": len(applications),
-        "users": len(set(app["user_id"] for app in applications)),
-    }
+    def __init__(self):
+        self.generated_at = datetime.utcnow().isoformat()
+        self.applications = 0
+        self.by_bank = defaultdict(lambda: {
+            "applications": 0,
+            "users": HyperLogLog(),
+        })
 
-    by_bank = defaultdict(lambda: {
-        "applications": 0,
-        "users": set(),
-    })
+    def add(self, app: dict):
+        self.applications += 1
+        bank = self.by_bank[app["bank"]]
+        bank["applications"] += 1
+        bank["users"].add(app["user_id"])
+
+    def as_dict(self) -> dict:
+        all_users = HyperLogLog()
+        by_bank_json = []
+        for bank, data in self.by_bank.items():
+            all_users.merge(data["users"])
+            by_bank_json.append({
+                "bank": bank,
+                "applications": data["applications"],
+                "users": data["users"].count()
+            })
+
+        return {
+            "generated_at": self.generated_at,
+            "totals": {
+                "applications": self.applications,
+                "users": all_users.count(),
+                "users_error": round(all_users.error, 4),
+            },
+            "by_bank": by_bank_json,
+        }
 
-    apps_list = []
 
-    for app in applications:
-        totals["applications"] += 1
-        by_bank[app["bank_key"]]["applications"] += 1
-        by_bank[app["bank_key"]]["users"].add(app["user_id"])
-
-        apps_list.append({
-            "application_id": app["id"],
-            "user_id": app["user_id"],
-            "bank": app["bank_key"],
-            "product_key": app["product_key"],
-            "variant_key": app.get("variant_key"),
-            "created_at": app["created_at"]
-        })
+async def build_referrer_report():
+    """
+    Основной отчёт для админа одним словарём (для небольших объёмов / API).
+    Для выгрузки файлом используйте export_referrer_report().
+    """
+    summary = ReferrerReportSummary()
+    apps_list = []
 
-    # Преобразуем множества пользователей в число
-    by_bank_json = []
-    for bank, data in by_bank.items():
-        by_bank_json.append({
-            "bank": bank,
-            "applications": data["applications"],
-            "users": len(data["users"])
-        })
+    async for chunk in iter_applications():
+        for app in chunk:
+            summary.add(app)
+        apps_list.extend(chunk)
 
     return {
-        "generated_at": now,
-        "totals": totals,
-        "by_bank": by_bank_json,
+        **summary.as_dict(),
         "applications": apps_list
     }
 
 
+async def export_referrer_report(fmt: str = "ndjson", compress: bool = False) -> tuple[str, dict]:
+    """
+    Потоковая выгрузка заявок в NDJSON/CSV (опционально gzip) во временный файл.
+    Возвращает путь к файлу и итоги, посчитанные за тот же проход;
+    в NDJSON итоги дописываются последней строкой {"summary": ...}.
+    """
+    summary = ReferrerReportSummary()
+
+    async def chunks():
+        async for chunk in iter_applications():
+            for app in chunk:
+                summary.add(app)
+            yield chunk
+
+    path = await export_rows(
+        chunks(),
+        fmt,
+        APPLICATION_FIELDS,
+        compress=compress,
+        trailer=lambda: {"summary": summary.as_dict()},
+    )
+    return path, summary.as_dict()
+
+
 async def build_weekly_traffic_report(weeks: int = 1):
-    async with get_db_connection() as db:
-        cursor = await db.execute("""
-            SELECT
-                strftime('%Y-%W', a.created_at) AS week,
-                COALESCE(u.traffic_source, 'unknown') AS traffic_source,
-                COUNT(DISTINCT a.user_id) AS users,
-                COUNT(a.id) AS applications
-            FROM applications a
-            LEFT JOIN users u ON u.user_id = a.user_id
-            WHERE a.created_at >= date('now', ?)
-            GROUP BY week, traffic_source
-            ORDER BY week DESC
-        """, (f"-{weeks * 7} days",))
-
-        rows = await cursor.fetchall()
-
-    report = defaultdict(list)
-    for r in rows:
-        report[r["week"]].append({
-            "traffic_source": r["traffic_source"],
-            "users": r["users"],
-            "applications": r["applications"]
-        })
+    """
+    Последние weeks календарных недель (Пн–Вс по МСК, текущая — неполная).
+    Заявки — из дневных роллапов, уникальные пользователи — из HLL-скетчей.
+    """
+    this_week = msk_week_start(datetime.now(MSK).date())
+    report = {}
+
+    for i in range(weeks):
+        week_start = this_week - timedelta(weeks=i)
+        week_end = week_start + timedelta(days=6)
+
+        async with get_db_connection(readonly=True) as db:
+            cursor = await db.execute("""
+                SELECT traffic_source, SUM(applications) AS applications
+                FROM rollup_daily_applications
+                WHERE day >= ? AND day <= ?
+                GROUP BY traffic_source
+            """, (f"{week_start:%Y-%m-%d}", f"{week_end:%Y-%m-%d}"))
+            rows = await cursor.fetchall()
 
-    return dict(report)
+        if rows:
+            # Уникальные по всем источникам недели — одним запросом к скетчам
+            users = await count_distinct_users_by_source(week_start, week_end)
+            week_rows = []
+            for r in rows:
+                source_users = users.get(r["traffic_source"])
+                week_rows.append({
+                    "traffic_source": r["traffic_source"],
+                    "users": source_users["value"] if source_users else 0,
+                    "applications": r["applications"]
+                })
+            report[f"{week_start:%Y-%W}"] = week_rows
+
+    return report
 
 
 def render_weekly_report_text(data: dict) -> str:
@@ -0,0 +1,67 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from typing import AsyncIterator, Callable
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+# ==============================
+# Streaming export
+# ==============================
+# Строки пишутся во временный файл пачками по мере чтения из курсора,
+# поэтому память не зависит от размера таблицы.
+
+async def export_rows(
+    rows: AsyncIterator[list[dict]],
+    fmt: str,
+    fieldnames: list[str],
+    compress: bool = False,
+    trailer: Callable[[], dict] | None = None,
+) -> str:
+    """
+    Пишет пачки строк в NDJSON или CSV (опционально gzip) во временный файл
+    и возвращает путь к нему. Файл удаляет вызывающий код.
+
+    trailer — для NDJSON: функция, чей результат дописывается последней строкой
+    (например, итоги, посчитанные за тот же проход).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    suffix = f".{fmt}" + (".gz" if compress else "")
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=suffix)
+    os.close(fd)
+
+    opener = gzip.open if compress else open
+    try:
+        with opener(path, "wt", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+                writer.writeheader()
+
+            async for chunk in rows:
+                if fmt == "csv":
+                    writer.writerows(chunk)
+                    data = buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                else:
+                    data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk)
+                # запись (и сжатие) — в потоке, чтобы не блокировать event loop
+                await asyncio.to_thread(f.write, data)
+
+            if fmt == "csv":
+                await asyncio.to_thread(f.write, buffer.getvalue())
+            elif trailer is not None:
+                await asyncio.to_thread(f.write, json.dumps(trailer(), ensure_ascii=False) + "\n")
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path
@@ -0,0 +1,81 @@
+"""
+Исходящие отправки с учётом лимитов Telegram: ~30 сообщений в секунду на
+бота и ~1 в секунду в один чат (с коротким всплеском SEND_CHAT_BURST).
+
+SendScheduler — request-middleware сессии бота: каждый send*/edit*/
+copy*/forward* с chat_id берёт токен из общего ведра и из ведра чата и при
+необходимости ждёт своей очереди. Ответ 429 (TelegramRetryAfter) ставит
+чат на паузу retry_after секунд, после чего запрос повторяется —
+до SEND_MAX_RETRIES раз, с каждой попыткой пауза на секунду длиннее.
+"""
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config import settings
+from utils.token_bucket import KeyedBuckets, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+# Дольше ждать бессмысленно: пользователь уже ушёл, а хендлер висит
+MAX_RETRY_AFTER = 60
+
+
+class SendScheduler(BaseRequestMiddleware):
+    def __init__(self):
+        self.global_bucket = TokenBucket(settings.SEND_GLOBAL_RATE, settings.SEND_GLOBAL_RATE)
+        self.chats = KeyedBuckets(settings.SEND_CHAT_RATE, settings.SEND_CHAT_BURST)
+        self.max_retries = settings.SEND_MAX_RETRIES
+
+        # счётчики
+        self._sent = 0
+        self._delayed = 0
+        self._retried = 0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        attempt = 0
+        while True:
+            chat_bucket = self.chats.get(chat_id)
+            delay = max(chat_bucket.reserve(), self.global_bucket.reserve())
+            if delay > 0:
+                self._delayed += 1
+                await asyncio.sleep(delay)
+
+            try:
+                response = await make_request(bot, method)
+                self._sent += 1
+                return response
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries or e.retry_after > MAX_RETRY_AFTER:
+                    raise
+                attempt += 1
+                self._retried += 1
+                pause = e.retry_after + attempt - 1
+                logger.warning(
+                    "Flood control on %s in chat %s: retry %s/%s in %ss",
+                    method.__api_method__, chat_id, attempt, self.max_retries, pause
+                )
+                chat_bucket.pause(pause)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self._sent,
+            "delayed": self._delayed,
+            "retried": self._retried,
+            "chats": len(self.chats),
+        }
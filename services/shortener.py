@@ -0,0 +1,101 @@
+"""
+Сокращатели ссылок. Backend выбирается настройкой SHORTENER_BACKEND:
+
+    clck  — внешний https://clck.ru (за предохранителем, см. circuit_breaker.py);
+    local — собственные base62-коды из таблицы local_links, переходы
+            обслуживает services/redirect_server.py и считает клики;
+    none  — ссылки не сокращаются.
+
+Backend возвращает короткий URL или бросает исключение; превращение
+ошибки в длинный URL — забота shorten_link() в db/referrals.py.
+"""
+import abc
+import logging
+
+from config import settings
+from db.local_links import issue_code
+from .circuit_breaker import CircuitBreaker
+from .http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+
+class ShortenerBackend(abc.ABC):
+    name = "base"
+    # Внешний сервис: фоновое сокращение ограничивает к нему частоту запросов
+    remote = False
+
+    @abc.abstractmethod
+    async def shorten(self, url: str) -> str:
+        """Короткий URL для url или исключение."""
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class NoopShortener(ShortenerBackend):
+    name = "none"
+
+    async def shorten(self, url: str) -> str:
+        return url
+
+
+class ClckShortener(ShortenerBackend):
+    name = "clck"
+    remote = True
+    api = "https://clck.ru/--"
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            "shortener",
+            budget=settings.SHORTENER_TIMEOUT,
+            failure_threshold=settings.SHORTENER_FAILURE_THRESHOLD,
+            reset_timeout=settings.SHORTENER_RESET_TIMEOUT,
+            hedge=settings.SHORTENER_HEDGE,
+        )
+
+    async def _request(self, url: str) -> str:
+        session = await get_http_session()
+        async with session.post(self.api, data={"url": url}) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            short_url = (await resp.text()).strip()
+        if not short_url.startswith(("http://", "https://")):
+            raise RuntimeError(f"unexpected response: {short_url[:100]}")
+        return short_url
+
+    async def shorten(self, url: str) -> str:
+        return await self.breaker.call(lambda: self._request(url))
+
+    def stats(self) -> dict:
+        return {"backend": self.name, **self.breaker.stats()}
+
+
+class LocalShortener(ShortenerBackend):
+    name = "local"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    async def shorten(self, url: str) -> str:
+        return f"{self.base_url}/{await issue_code(url)}"
+
+
+_BACKENDS = {
+    "clck": ClckShortener,
+    "local": lambda: LocalShortener(settings.SHORTENER_BASE_URL),
+    "none": NoopShortener,
+}
+
+_shortener: ShortenerBackend | None = None
+
+
+def get_shortener() -> ShortenerBackend:
+    global _shortener
+    if _shortener is None:
+        backend = settings.SHORTENER_BACKEND
+        if backend not in _BACKENDS:
+            raise ValueError(f"Неизвестный SHORTENER_BACKEND: {backend} (ожидается одно из {', '.join(_BACKENDS)})")
+        _shortener = _BACKENDS[backend]()
+        logger.info("Link shortener backend: %s", backend)
+    return _shortener
@@ -0,0 +1,139 @@
+"""
+Webhook-режим (BOT_MODE=webhook): aiohttp-приложение принимает апдейты от
+Telegram вместо long polling.
+
+    POST WEBHOOK_PATH      — апдейты; заголовок X-Telegram-Bot-Api-Secret-Token
+                             сверяется с WEBHOOK_SECRET, чужие запросы получают 401;
+    GET  /healthz          — проверка для балансировщика;
+    GET  /analytics/summary — сводка аналитики, если задан ANALYTICS_TOKEN
+                             (Authorization: Bearer <token>);
+    GET  /metrics          — очереди апдейтов, троттлинг и исходящие отправки,
+                             с тем же токеном.
+
+Апдейт обрабатывается в фоне, Telegram сразу получает 200 — долгий хендлер
+не задерживает доставку следующих апдейтов.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from analytics.summary import build_summary
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+DISPATCHER_KEY = web.AppKey("dispatcher", Dispatcher)
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """SimpleRequestHandler, дожидающийся фоновых апдейтов при остановке."""
+
+    async def drain(self, timeout: float):
+        # Фоновые задачи feed_update хранит базовый класс (aiogram 3.11)
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        logger.info("Waiting for %s in-flight updates", len(tasks))
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning("%s updates still running after %ss, shutting down anyway", len(pending), timeout)
+
+
+HANDLER_KEY = web.AppKey("webhook_handler", DrainingRequestHandler)
+
+
+def webhook_secret() -> str:
+    # Telegram допускает только [A-Za-z0-9_-], до 256 символов
+    return settings.WEBHOOK_SECRET or hashlib.sha256(f"webhook:{settings.BOT_TOKEN}".encode()).hexdigest()
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def _check_token(request: web.Request):
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token, settings.ANALYTICS_TOKEN):
+        raise web.HTTPUnauthorized()
+
+
+async def handle_analytics_summary(request: web.Request) -> web.Response:
+    _check_token(request)
+    return web.json_response(await build_summary())
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    _check_token(request)
+    dp = request.app[DISPATCHER_KEY]
+    return web.json_response({
+        name: component.stats() if component else None
+        for name, component in (
+            ("updates", dp.get("update_scheduler")),
+            ("throttling", dp.get("throttling")),
+            ("sends", dp.get("send_scheduler")),
+        )
+    })
+
+
+def create_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    app[DISPATCHER_KEY] = dp
+    handler = DrainingRequestHandler(dispatcher=dp, bot=bot, secret_token=webhook_secret())
+    handler.register(app, path=settings.WEBHOOK_PATH)
+    app[HANDLER_KEY] = handler
+    app.router.add_get("/healthz", handle_health)
+    if settings.ANALYTICS_TOKEN:
+        app.router.add_get("/analytics/summary", handle_analytics_summary)
+        app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """
+    Регистрирует webhook и обслуживает его до SIGINT/SIGTERM.
+    Startup/shutdown-хуки диспетчера вызываются так же, как при polling.
+    """
+    if not settings.WEBHOOK_BASE_URL:
+        raise ValueError("BOT_MODE=webhook требует WEBHOOK_BASE_URL")
+
+    app = create_app(dp, bot)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    # Хуки до открытия порта: webhook от прошлого запуска остаётся
+    # зарегистрированным, и накопленные апдейты придут сразу
+    await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot], **dp.workflow_data)
+    try:
+        await site.start()
+        logger.info("Webhook server listening on %s:%s", settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+        await bot.set_webhook(
+            url=f"{settings.WEBHOOK_BASE_URL}{settings.WEBHOOK_PATH}",
+            secret_token=webhook_secret(),
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=settings.DROP_PENDING_UPDATES,
+        )
+        await stop.wait()
+    finally:
+        # webhook не снимаем: апдейты копятся у Telegram до следующего запуска.
+        # Новых апдейтов не принимаем и дожидаемся начатых — им ещё нужны
+        # пул БД, write-behind очередь и FSM-хранилище, которые main() закроет следом
+        await site.stop()
+        await app[HANDLER_KEY].drain(settings.WEBHOOK_DRAIN_TIMEOUT)
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot], **dp.workflow_data)
+        # закрывает и сессию бота (SimpleRequestHandler.close)
+        await runner.cleanup()
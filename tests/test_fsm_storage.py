@@ -0,0 +1,39 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from db import fsm_storage
+from db.fsm_storage import SQLiteStorage
+
+
+def test_failed_flush_is_retried_and_record_stays_hot(monkeypatch):
+    results = [False, True]
+    written = []
+
+    def fake_submit(statements):
+        future = asyncio.get_running_loop().create_future()
+        written.append(statements)
+        asyncio.get_running_loop().call_soon(future.set_result, results.pop(0))
+        return future
+
+    monkeypatch.setattr(fsm_storage, "submit_write", fake_submit)
+
+    async def scenario():
+        storage = SQLiteStorage(flush_interval_ms=10, hot_max=1)
+        key = StorageKey(bot_id=1, chat_id=2, user_id=3)
+        storage._hot[storage.key_builder.build(key)] = fsm_storage._Record()
+        await storage.set_data(key, {"step": 1})
+
+        await storage.flush(wait=True)
+        # Неудачная запись: ключ снова грязный и не выгружается из памяти
+        assert storage.stats()["dirty"] == 1
+        storage._hot["other"] = fsm_storage._Record()
+        storage._trim()
+        assert list(storage._hot) == [storage.key_builder.build(key)]
+
+        await asyncio.sleep(0.05)
+        return storage.stats()
+
+    stats = asyncio.run(scenario())
+    assert len(written) == 2
+    assert stats["dirty"] == 0 and stats["inflight"] == 0 and stats["failed"] == 1
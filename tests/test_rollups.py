@@ -0,0 +1,37 @@
+import asyncio
+
+from db.base import close_db_pool, get_db_connection
+from db.index_advisor import seed
+from db.init import initialize_database
+from db.rollups import ROLLUP_TABLES, rebuild_rollups
+
+
+async def _snapshot(db) -> dict:
+    snapshot = {}
+    for table in ROLLUP_TABLES:
+        cur = await db.execute(f"SELECT * FROM {table} ORDER BY 1, 2")
+        snapshot[table] = [tuple(row) for row in await cur.fetchall()]
+    return snapshot
+
+
+def test_delete_trigger_matches_rebuild():
+    async def scenario():
+        await initialize_database()
+        await seed(20, 200)
+        try:
+            async with get_db_connection() as db:
+                # seed пишет заявки не по порядку дат, а insert-триггер считает
+                # первым днём первую вставленную — выравниваем исходное состояние
+                await rebuild_rollups(db)
+                # Разные случаи: последняя заявка пользователя, первый день, середина
+                await db.execute("DELETE FROM applications WHERE id % 3 = 0")
+                await db.execute("DELETE FROM applications WHERE user_id IN (SELECT user_id FROM applications LIMIT 2)")
+                await db.commit()
+                by_triggers = await _snapshot(db)
+                await rebuild_rollups(db)
+                return by_triggers, await _snapshot(db)
+        finally:
+            await close_db_pool()
+
+    by_triggers, rebuilt = asyncio.run(scenario())
+    assert by_triggers == rebuilt
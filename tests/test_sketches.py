@@ -0,0 +1,47 @@
+import asyncio
+from datetime import date
+
+from db.base import close_db_pool, get_db_connection
+from db.init import initialize_database
+from db.sketches import EXACT_BELOW, count_distinct_users, count_distinct_users_by_source, rebuild_sketches
+
+DAY = date(2020, 1, 15)
+
+
+def test_grouped_count_matches_per_source():
+    async def scenario():
+        await initialize_database()
+        try:
+            # Один источник выше порога точного подсчёта, остальные — ниже
+            sizes = {"ads": 2 * EXACT_BELOW + 500, "organic": 30, "blog": 5}
+            user_id = 9_000_000
+            async with get_db_connection() as db:
+                for source, size in sizes.items():
+                    apps = []
+                    for _ in range(size):
+                        user_id += 1
+                        apps.append((user_id, "bank_a" if user_id % 2 else "bank_b", source))
+                    await db.executemany(
+                        "INSERT INTO applications (user_id, bank_key, product_key, traffic_source, created_at) "
+                        "VALUES (?, ?, 'p', ?, '2020-01-15 09:00:00')",
+                        apps
+                    )
+                await db.commit()
+                await rebuild_sketches(db)
+
+            results = []
+            for bank_key in (None, "bank_a"):
+                grouped = await count_distinct_users_by_source(DAY, DAY, bank_key=bank_key)
+                single = {
+                    source: await count_distinct_users(DAY, DAY, bank_key=bank_key, traffic_source=source)
+                    for source in sizes
+                }
+                results.append((grouped, single))
+            return results
+        finally:
+            await close_db_pool()
+
+    for grouped, single in asyncio.run(scenario()):
+        assert grouped == single
+        assert grouped["ads"]["exact"] is False
+        assert grouped["blog"]["exact"] is True
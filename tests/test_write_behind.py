@@ -0,0 +1,23 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from db import write_behind
+from db.write_behind import WriteBehindQueue
+
+
+def test_futures_resolve_false_when_connection_fails(monkeypatch):
+    @asynccontextmanager
+    async def broken_connection(*args, **kwargs):
+        raise OSError("database is unavailable")
+        yield
+
+    monkeypatch.setattr(write_behind, "get_db_connection", broken_connection)
+
+    async def scenario():
+        queue = WriteBehindQueue(interval_ms=10, max_batch=10)
+        futures = [queue.submit([("INSERT INTO t VALUES (?)", (i,))]) for i in range(3)]
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=5)
+        await queue.stop()
+        return results
+
+    assert asyncio.run(scenario()) == [False, False, False]
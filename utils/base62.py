@@ -0,0 +1,27 @@
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+
+
+def encode(number: int) -> str:
+    if number < 0:
+        raise ValueError("base62 кодирует только неотрицательные числа")
+    if number == 0:
+        return ALPHABET[0]
+    chars = []
+    while number:
+        number, rem = divmod(number, 62)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+def decode(code: str) -> int:
+    """ValueError, если в коде есть символы вне алфавита."""
+    if not code:
+        raise ValueError("пустой base62-код")
+    number = 0
+    for c in code:
+        try:
+            number = number * 62 + _INDEX[c]
+        except KeyError:
+            raise ValueError(f"недопустимый символ base62: {c!r}") from None
+    return number
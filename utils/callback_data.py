@@ -0,0 +1,25 @@
+from aiogram.filters.callback_data import CallbackData
+
+# =========================
+# CALLBACK DATA (каталог для пользователя)
+# =========================
+# Продукты и варианты передаются числовыми id из снимка каталога
+# (db/catalog.py), а не слагами: payload не упирается в лимит Telegram
+# в 64 байта при длинных variant_key и разбирается один раз фильтром.
+
+
+class ProductCallback(CallbackData, prefix="up"):
+    product_id: int
+
+
+class VariantCallback(CallbackData, prefix="uv"):
+    variant_id: int
+
+
+class ProductConditionsCallback(CallbackData, prefix="upc"):
+    product_id: int
+
+
+class ApplyOfferCallback(CallbackData, prefix="ao"):
+    product_id: int
+    variant_id: int = 0  # 0 — без варианта
@@ -0,0 +1,27 @@
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo  # Python 3.9+
+
+MSK = ZoneInfo("Europe/Moscow")
+
+# Формат CURRENT_TIMESTAMP в SQLite: created_at хранится в UTC
+DB_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def msk_day_start_utc(day: date) -> str:
+    """Полночь дня day по МСК в UTC-формате колонки created_at."""
+    start = datetime.combine(day, time.min, tzinfo=MSK)
+    return start.astimezone(timezone.utc).strftime(DB_TIMESTAMP_FORMAT)
+
+
+def msk_period_utc(start_day: date, end_day: date) -> tuple[str, str]:
+    """
+    Дни start_day..end_day (включительно, МСК) как полуоткрытый диапазон
+    для `created_at >= ? AND created_at < ?` — такое условие использует
+    индекс по created_at, в отличие от DATE(created_at).
+    """
+    return msk_day_start_utc(start_day), msk_day_start_utc(end_day + timedelta(days=1))
+
+
+def msk_week_start(day: date) -> date:
+    """Понедельник недели, в которую попадает day."""
+    return day - timedelta(days=day.weekday())
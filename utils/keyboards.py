@@ -6,7 +6,7 @@ from aiogram.types import (
     )
 
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from db.banks import get_active_banks
+from db.catalog import get_catalog
 from typing import Union
 
 def get_start_kb():
@@ -26,7 +26,7 @@ def get_user_main_menu_kb():
     )
 
 async def get_user_bank_kb() -> ReplyKeyboardMarkup:
-    banks = await get_active_banks()
+    banks = get_catalog().active_banks()
     if not banks:
         return ReplyKeyboardMarkup(
             keyboard=[[KeyboardButton(text="🏦 Банки отсутствуют")]],
@@ -74,7 +74,8 @@ def get_admin_dashboard_kb():
 
 def get_admin_reports_kb():
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📤 JSON-отчёт", callback_data="admin:report:json")],
+        [InlineKeyboardButton(text="📤 JSON-отчёт", callback_data="admin:report:json"),
+        InlineKeyboardButton(text="📊 CSV-отчёт", callback_data="admin:report:csv")],
         [InlineKeyboardButton(text="📄 PDF-отчёт", callback_data="admin:report:pdf")],
         [InlineKeyboardButton(text="📆 Еженедельная аналитика", callback_data="admin:report:weekly")],
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_panel")],
@@ -0,0 +1,74 @@
+import time
+from typing import Dict, Hashable
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше burst про запас.
+
+    try_acquire() — без ожидания (входящий троттлинг отбрасывает лишнее);
+    reserve() — забирает токен в долг и возвращает, сколько секунд подождать
+    (исходящие отправки встают в очередь в порядке вызова).
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self) -> float:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def pause(self, seconds: float):
+        """Следующий токен — не раньше чем через seconds секунд (ответ 429 с retry_after)."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class KeyedBuckets:
+    """Вёдра по ключу (user_id, chat_id, ...); полные вёдра удаляются, когда их много."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def get(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self.prune()
+                # Все вёдра заняты — жертвуем самым старым
+                if len(self._buckets) >= self.max_keys:
+                    del self._buckets[next(iter(self._buckets))]
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def prune(self):
+        # Полное ведро ничем не отличается от нового
+        for key in [k for k, b in self._buckets.items() if b.is_full()]:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)